@@ -197,7 +197,7 @@ async def get_active_sessions():
                     "session_id": session_id,
                     "dataset_name": session_info.dataset_name,
                     "created_at": session_info.created_at,
-                    "last_activity": session_info.last_activity,
+                    "last_activity": session_manager.get_last_activity_iso(session_id),
                     "has_websocket": session_id in websocket_connections
                 }
                 for session_id, session_info in session_manager.sessions.items()
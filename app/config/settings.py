@@ -40,6 +40,12 @@ class Settings(BaseSettings):
     datetime_threshold: float = Field(default=0.7, env="DATETIME_THRESHOLD")
     categorical_threshold: int = Field(default=50, env="CATEGORICAL_THRESHOLD")
     
+    # Kernel Execution
+    kernel_mode: str = Field(default="subprocess", env="KERNEL_MODE")  # "subprocess" or "inprocess"
+    
+    # Session State Backend
+    redis_url: Optional[str] = Field(default=None, env="REDIS_URL")  # e.g. redis://localhost:6379/2
+    
     # File Paths
     datasets_dir: str = Field(default="datasets", env="DATASETS_DIR")
     metadata_dir: str = Field(default="metadata", env="METADATA_DIR")
@@ -47,6 +53,7 @@ class Settings(BaseSettings):
     # Data Sampling
     max_categorical_unique: int = Field(default=50, env="MAX_CATEGORICAL_UNIQUE")
     data_sample_size: int = Field(default=15, env="DATA_SAMPLE_SIZE")
+    profile_sample_rows: int = Field(default=50000, env="PROFILE_SAMPLE_ROWS")
     
     class Config:
         """Pydantic configuration."""
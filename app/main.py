@@ -123,5 +123,7 @@ async def shutdown_event():
 if __name__ == "__main__":
     import uvicorn
     logger.info("🚀 Starting server on http://0.0.0.0:8000")
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # permessage-deflate shrinks large chart/table frames on the wire;
+    # tiny log frames pay negligible overhead at this size
+    uvicorn.run(app, host="0.0.0.0", port=8000, ws_per_message_deflate=True)
 
@@ -15,6 +15,9 @@ class MessageType(str, Enum):
     ERROR = "error"
     TABLE = "table"
     CHART = "chart"
+    CHART_BEGIN = "chart_begin"
+    CHART_CHUNK = "chart_chunk"
+    CHART_END = "chart_end"
     FINAL_RESPONSE = "final_response"
     PLAN = "plan"
     EXECUTION_START = "execution_start"
@@ -147,9 +150,12 @@ class AgentState(BaseModel):
     plan: Optional[AgentPlan] = Field(None, description="Execution plan")
     current_step_index: int = Field(default=0, description="Current step being executed")
     execution_history: List[str] = Field(default=[], description="Log of completed steps")
+    execution_history_tail: List[str] = Field(default=[], description="Last few execution history entries for prompts")
     execution_context: Dict[str, Any] = Field(default={}, description="Variables and results from previous executions")
+    simplified_execution_context: Dict[str, Any] = Field(default={}, description="Pre-truncated execution context for LLM prompts")
     intermediate_results: List[Dict[str, Any]] = Field(default=[], description="Stored intermediate results (tables, charts)")
     available_variables: List[str] = Field(default=["df"], description="List of available variables in Jupyter kernel")
+    available_vars_str: str = Field(default="df", description="Cached comma-joined available variables for prompts")
     final_data: Optional[Dict[str, Any]] = Field(None, description="Final analysis result")
     chart_code: Optional[str] = Field(None, description="Generated chart code")
     final_response: Optional[str] = Field(None, description="Final response to user")
@@ -1,10 +1,18 @@
 """Multi-agent system using LangGraph for Phase 2 query processing."""
 
+import ast
 import json
+import logging
+import re
 import threading
+from itertools import islice
 from typing import Any, Callable, Dict, List, Optional
 
+import orjson
+import tiktoken
+
 from langchain_core.prompts import ChatPromptTemplate
+from langgraph.checkpoint.memory import MemorySaver
 from langgraph.graph import StateGraph, END
 
 from ..config.settings import get_settings
@@ -26,107 +34,233 @@ from ..services.jupyter_service import get_jupyter_service
 from ..services.session_service import get_session_manager
 from ..utils.validation_utils import validate_json_content
 
+logger = logging.getLogger(__name__)
+
+# Precompiled fenced-block extractors (avoid per-call line scanning)
+_CODE_BLOCK_RE = re.compile(r"```(?:python)?\n(.*?)\n```", re.DOTALL)
+_JSON_BLOCK_RE = re.compile(r"```json\n(.*?)\n```", re.DOTALL)
+
+# Assignment targets that are plotting scaffolding, not analysis variables
+_SKIP_VARS = frozenset({"fig", "plt", "ax"})
+
+# Token budgeting for the code-generation prompt. Char cutoffs are a weak
+# proxy for token cost, so prompt sections are measured with tiktoken and
+# trimmed lowest-priority-first to stay inside the model's context window.
+_MODEL_CONTEXT_TOKENS = 128000
+_MAX_OUTPUT_TOKENS = 4096
+_PROMPT_TOKEN_BUDGET = _MODEL_CONTEXT_TOKENS - _MAX_OUTPUT_TOKENS - 500
+
+# Trimmed/dropped in this order (lowest priority first).
+_SECTION_PRIORITY = ("log_of_past_steps", "execution_context", "metadata_json", "current_step_from_plan")
+
+# Encoder resolved once at import: encoding_for_model loads BPE tables on
+# first use, which must not happen inside the hot agent loop.
+try:
+    _TIKTOKEN_ENC = tiktoken.encoding_for_model("gpt-4o")
+except KeyError:
+    _TIKTOKEN_ENC = tiktoken.get_encoding("cl100k_base")
+
+
+def _extract_json(content: str) -> str:
+    """Extract JSON content from markdown code blocks."""
+    content = content.strip()
+
+    # Check if content is wrapped in ```json code blocks
+    if '```json' in content:
+        match = _JSON_BLOCK_RE.search(content)
+        if match:
+            return match.group(1).strip()
+
+    elif content.startswith('```'):
+        # Handle generic code blocks
+        lines = content.split('\n')
+        if len(lines) > 2:
+            return '\n'.join(lines[1:-1]).strip()
+
+    # Return as-is if no code blocks found
+    return content
+
+
+def _fit_to_budget(sections: Dict[str, str], budget: int) -> Dict[str, str]:
+    """Trim prompt sections to a token budget, lowest priority first."""
+    enc = _TIKTOKEN_ENC
+    tokens = {name: enc.encode(text) for name, text in sections.items()}
+    total = sum(len(t) for t in tokens.values())
+    if total <= budget:
+        return sections
+
+    fitted = dict(sections)
+    for name in _SECTION_PRIORITY:
+        if total <= budget:
+            break
+        if name not in tokens:
+            continue
+        overshoot = total - budget
+        section_tokens = tokens[name]
+        if len(section_tokens) <= overshoot:
+            fitted[name] = ""
+            total -= len(section_tokens)
+        else:
+            # Keep the tail: recent context matters more than old context.
+            fitted[name] = enc.decode(section_tokens[overshoot:])
+            total = budget
+    return fitted
+
+
+# Compiled LangGraph cached per process: compile() walks the graph and builds
+# the Pregel executor, so reinstantiating the service must not redo that work.
+_COMPILED_GRAPH = None
+_graph_lock = threading.Lock()
+
+
+def _route_entry(state: AgentState) -> str:
+    """Resume mid-plan on follow-up turns instead of replaying the planner."""
+    if state.plan and not state.plan.completed and state.current_step_index < len(state.plan.steps):
+        logger.debug("↩️ Resuming existing plan at step %s", state.current_step_index + 1)
+        return "code_generator"
+    return "planner"
+
+
+def _get_compiled_graph(nodes: Dict[str, Callable], router: Callable):
+    """Build and compile the workflow graph once per process."""
+    global _COMPILED_GRAPH
+    if _COMPILED_GRAPH is None:
+        with _graph_lock:
+            if _COMPILED_GRAPH is None:
+                workflow = StateGraph(AgentState)
+
+                for name, node in nodes.items():
+                    workflow.add_node(name, node)
+
+                workflow.set_conditional_entry_point(
+                    _route_entry,
+                    {
+                        "planner": "planner",
+                        "code_generator": "code_generator"
+                    }
+                )
+
+                workflow.add_edge("planner", "code_generator")
+                workflow.add_edge("code_generator", "executor")
+                workflow.add_conditional_edges(
+                    "executor",
+                    router,
+                    {
+                        "continue": "code_generator",
+                        "error": "error_analyzer",
+                        "chart": "chart_generator",
+                        "complete": "final_responder"
+                    }
+                )
+                workflow.add_edge("error_analyzer", "code_generator")
+                workflow.add_edge("chart_generator", "executor")
+                workflow.add_edge("final_responder", END)
+
+                # MemorySaver persists node state per thread_id, so follow-up
+                # turns in a session resume instead of replaying the planner.
+                _COMPILED_GRAPH = workflow.compile(checkpointer=MemorySaver())
+                logger.info("✅ LangGraph workflow compiled (process-wide cache)")
+    return _COMPILED_GRAPH
+
 
 class MultiAgentService:
     """Multi-agent service for processing natural language queries."""
     
     def __init__(self):
         """Initialize the multi-agent service."""
-        print("🔄 Initializing MultiAgentService...")
+        logger.debug("🔄 Initializing MultiAgentService...")
 
-        print("📋 Loading settings...")
+        logger.debug("📋 Loading settings...")
         self.settings = get_settings()
-        print(f"🔧 LLM Provider: {self.settings.llm_provider}")
+        logger.debug("🔧 LLM Provider: %s", self.settings.llm_provider)
         
         # Validate the appropriate API key based on provider
-        print("🔑 Validating API key for current provider...")
+        logger.debug("🔑 Validating API key for current provider...")
         try:
             self.settings.validate_current_provider_key()
-            print(f"✅ {self.settings.llm_provider.upper()} API key validated")
+            logger.debug("✅ %s API key validated", self.settings.llm_provider.upper())
         except Exception as e:
-            print(f"❌ API key validation failed: {e}")
+            logger.error("❌ API key validation failed: %s", e)
             raise
 
-        print(f"🤖 Creating {self.settings.llm_provider.upper()} client...")
+        logger.debug("🤖 Creating %s client...", self.settings.llm_provider.upper())
         try:
             import time
             start_time = time.time()
-            print(f"🔄 Attempting to create {self.settings.llm_provider.upper()} client...")
+            logger.debug("🔄 Attempting to create %s client...", self.settings.llm_provider.upper())
             # Create LLM client using the provider factory
             self.llm = get_configured_llm(self.settings)
             elapsed = time.time() - start_time
-            print(f"✅ {self.settings.llm_provider.upper()} client created successfully in {elapsed:.2f}s")
+            logger.debug("✅ %s client created successfully in %.2fs", self.settings.llm_provider.upper(), elapsed)
         except Exception as e:
-            print(f"❌ Failed to create {self.settings.llm_provider.upper()} client: {e}")
+            logger.error("❌ Failed to create %s client: %s", self.settings.llm_provider.upper(), e)
             raise
 
-        print("📊 Getting Jupyter service...")
+        logger.debug("📊 Getting Jupyter service...")
         try:
             self.jupyter_service = get_jupyter_service()
-            print("✅ Jupyter service obtained")
+            logger.debug("✅ Jupyter service obtained")
         except Exception as e:
-            print(f"❌ Failed to get Jupyter service: {e}")
+            logger.error("❌ Failed to get Jupyter service: %s", e)
             raise
             
-        print("📋 Getting session manager...")
+        logger.debug("📋 Getting session manager...")
         try:
             self.session_manager = get_session_manager()
-            print("✅ Session manager obtained")
+            logger.debug("✅ Session manager obtained")
         except Exception as e:
-            print(f"❌ Failed to get session manager: {e}")
+            logger.error("❌ Failed to get session manager: %s", e)
             raise
             
-        print("🏗️ Building workflow graph...")
+        # Kernel-manager lookups started during code generation, keyed by
+        # session, so executor start is hidden behind LLM latency
+        self._kernel_prefetch: Dict[str, Any] = {}
+
+        # Prompt chains are immutable; build them once instead of recompiling
+        # templates and re-piping the LLM on every agent call
+        self._planner_chain = ChatPromptTemplate.from_template(PLANNER_AGENT_PROMPT) | self.llm
+        self._code_generation_chain = ChatPromptTemplate.from_template(CODE_GENERATION_AGENT_PROMPT) | self.llm
+        self._error_analysis_chain = (
+            ChatPromptTemplate.from_template(ERROR_ANALYSIS_AGENT_PROMPT)
+            | self.llm.with_structured_output(ErrorAnalysisResponse)
+        )
+        self._chart_generation_chain = (
+            ChatPromptTemplate.from_template(CHART_GENERATION_AGENT_PROMPT)
+            | self.llm.with_structured_output(ChartGenerationResponse)
+        )
+        self._final_response_chain = ChatPromptTemplate.from_template(FINAL_RESPONSE_AGENT_PROMPT) | self.llm
+
+        logger.debug("🏗️ Building workflow graph...")
         try:
             self.graph = self._build_graph()
-            print("✅ Workflow graph built successfully")
+            logger.debug("✅ Workflow graph built successfully")
         except Exception as e:
-            print(f"❌ Failed to build workflow graph: {e}")
+            logger.error("❌ Failed to build workflow graph: %s", e)
             raise
             
-        print("🤖 MultiAgentService initialized with LangGraph workflow")
+        logger.info("🤖 MultiAgentService initialized with LangGraph workflow")
     
     def _build_graph(self) -> StateGraph:
-        """Build the LangGraph workflow."""
-        print("🏗️ Building LangGraph workflow...")
+        """Get the process-wide compiled LangGraph workflow."""
+        logger.debug("🏗️ Building LangGraph workflow...")
 
-        # Create the state graph
-        workflow = StateGraph(AgentState)
-        
-        # Add nodes
-        workflow.add_node("planner", self._planner_agent)
-        workflow.add_node("code_generator", self._code_generation_agent)
-        workflow.add_node("executor", self._code_executor)
-        workflow.add_node("error_analyzer", self._error_analysis_agent)
-        workflow.add_node("chart_generator", self._chart_generation_agent)
-        workflow.add_node("final_responder", self._final_response_agent)
-        
-        # Set entry point
-        workflow.set_entry_point("planner")
-        
-        # Add edges
-        workflow.add_edge("planner", "code_generator")
-        workflow.add_edge("code_generator", "executor")
-        workflow.add_conditional_edges(
-            "executor",
-            self._should_continue_execution,
+        # The service is a process singleton, so the compiled graph is cached
+        # at module level and bound to the first instance's agent methods.
+        return _get_compiled_graph(
             {
-                "continue": "code_generator",
-                "error": "error_analyzer", 
-                "chart": "chart_generator",
-                "complete": "final_responder"
-            }
+                "planner": self._planner_agent,
+                "code_generator": self._code_generation_agent,
+                "executor": self._code_executor,
+                "error_analyzer": self._error_analysis_agent,
+                "chart_generator": self._chart_generation_agent,
+                "final_responder": self._final_response_agent,
+            },
+            self._should_continue_execution,
         )
-        workflow.add_edge("error_analyzer", "code_generator")
-        workflow.add_edge("chart_generator", "executor")
-        workflow.add_edge("final_responder", END)  # END was imported above
-
-        print("✅ LangGraph workflow built successfully")
-        return workflow.compile()
     
     async def _planner_agent(self, state: AgentState) -> AgentState:
         """Planner agent that creates execution plan."""
-        print(f"🎯 Planner Agent: Creating plan for query: '{state.user_query}'")
+        logger.debug("🎯 Planner Agent: Creating plan for query: '%s'", state.user_query)
         
         try:
             # Format conversation history
@@ -135,65 +269,35 @@ class MultiAgentService:
                 for turn in state.conversation_history
             ]) if state.conversation_history else "No previous conversation."
             
-            # Create prompt
-            prompt = ChatPromptTemplate.from_template(PLANNER_AGENT_PROMPT)
-            chain = prompt | self.llm
-            
+            chain = self._planner_chain
 
             # Generate plan
-            response = chain.invoke({
+            response = await chain.ainvoke({
                 "user_query": state.user_query,
                 "chat_history": chat_history,
-                "metadata_json": json.dumps(state.dataset_metadata, indent=2)
+                "metadata_json": orjson.dumps(state.dataset_metadata).decode()
             })
-            print(f"response from planner agent: {response}")
-            # Parse the plan
-            def extract_json_from_markdown(content: str) -> str:
-                """Extract JSON content from markdown code blocks."""
-                content = content.strip()
-                
-                # Check if content is wrapped in code blocks
-                if content.startswith('```json'):
-                    # Find the start of JSON (after ```json\n)
-                    start_marker = '```json\n'
-                    end_marker = '\n```'
-                    
-                    start_idx = content.find(start_marker)
-                    if start_idx != -1:
-                        start_idx += len(start_marker)
-                        end_idx = content.find(end_marker, start_idx)
-                        if end_idx != -1:
-                            return content[start_idx:end_idx].strip()
-                
-                elif content.startswith('```'):
-                    # Handle generic code blocks
-                    lines = content.split('\n')
-                    if len(lines) > 2:
-                        return '\n'.join(lines[1:-1]).strip()
-                
-                # Return as-is if no code blocks found
-                return content
-
+            logger.debug("response from planner agent: %s", response)
             # Parse the plan
             plan_content = response.content if hasattr(response, 'content') else str(response)
-            
+
             # Extract JSON from markdown if present
-            clean_json = extract_json_from_markdown(plan_content)
+            clean_json = _extract_json(plan_content)
             plan_steps = json.loads(clean_json)
             
-            print(f"📋 Plan created with {len(plan_steps)} steps:")
+            logger.debug("📋 Plan created with %s steps:", len(plan_steps))
             for i, step in enumerate(plan_steps, 1):
-                print(f"  {i}. {step}")
+                logger.debug("  %s. %s", i, step)
             
             # Update state
             state.plan = AgentPlan(steps=plan_steps, current_step_index=0, completed=False)
             # state.plan = {"steps": plan_steps, "current_step_index": 0, "completed": False}
             state.current_step_index = 0
-            print("state returend successfully")
+            logger.debug("state returend successfully")
             return state
             
         except Exception as e:
-            print(f"❌ Planner Agent error: {e}")
+            logger.error("❌ Planner Agent error: %s", e)
             raise
     
     async def _code_generation_agent(self, state: AgentState) -> AgentState:
@@ -203,39 +307,37 @@ class MultiAgentService:
         import time
 
         current_step = state.plan.steps[state.current_step_index]
-        print(f"💻 Code Generation Agent: Working on step {state.current_step_index + 1}: '{current_step}'")
+        logger.debug("💻 Code Generation Agent: Working on step %s: '%s'", state.current_step_index + 1, current_step)
 
         try:
-            # Create prompt (using regular text output instead of structured output)
-            prompt = ChatPromptTemplate.from_template(CODE_GENERATION_AGENT_PROMPT)
-            chain = prompt | self.llm
-            
+            # Prebuilt chain (regular text output instead of structured output)
+            chain = self._code_generation_chain
             # Generate code
             error_analysis_text = ""
             if state.error_analysis:
                 error_analysis_text = f"Previous error: {state.error_analysis.diagnosis}\nSuggested fix: {state.error_analysis.suggestion}"
 
-            print("🔄 About to call OpenAI API for code generation...")
-            print(f"📊 Context size check:")
-            print(f"   - Plan steps: {len(json.dumps(state.plan.steps))} chars")
-            print(f"   - Execution history: {len(str(state.execution_history))} chars")
-            print(f"   - Available variables: {state.available_variables}")
-            print(f"   - Execution context size: {len(json.dumps(state.execution_context, indent=2)) if state.execution_context else 0} chars")
+            # Kick off the kernel-manager lookup so it overlaps the LLM call;
+            # _code_executor awaits it instead of doing a serial lookup
+            if state.session_id not in self._kernel_prefetch:
+                self._kernel_prefetch[state.session_id] = asyncio.create_task(
+                    asyncio.to_thread(self.session_manager.get_kernel_manager, state.session_id)
+                )
+
+            logger.debug("🔄 About to call OpenAI API for code generation...")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("📊 Context size check:")
+                logger.debug("   - Plan steps: %s chars", len(orjson.dumps(state.plan.steps)))
+                logger.debug("   - Execution history: %s chars", sum(len(x) for x in state.execution_history))
+                logger.debug("   - Available variables: %s", state.available_variables)
+                logger.debug("   - Execution context size: %s chars", len(orjson.dumps(state.execution_context)) if state.execution_context else 0)
 
             # Use asyncio with timeout for better control
             api_start = time.time()
             try:
-                # Simplify execution context to avoid huge prompts
-                simplified_context = {}
-                if state.execution_context:
-                    # Only include the most recent step's output (last 500 chars)
-                    for key, value in state.execution_context.items():
-                        if isinstance(value, dict) and 'output' in value:
-                            output = value.get('output', '')
-                            if len(output) > 500:
-                                value['output'] = output[:500] + "... (truncated)"
-                        simplified_context[key] = value
-                
+                # Pre-truncated context is maintained incrementally by _code_executor
+                simplified_context = state.simplified_execution_context
+
                 # Wrap in asyncio timeout for additional safety
                 # Extract just column information from metadata for the prompt
                 column_info = []
@@ -250,28 +352,33 @@ class MultiAgentService:
                     "columns": column_info
                 }
                 
+                prompt_inputs = {
+                    "metadata_json": orjson.dumps(metadata_simplified).decode(),
+                    "full_plan_json": orjson.dumps(state.plan.steps).decode(),
+                    "current_step_from_plan": current_step,
+                    "log_of_past_steps": "\n".join(state.execution_history_tail) if state.execution_history_tail else "No previous steps.",  # Only last 3 steps
+                    "available_variables": state.available_vars_str,
+                    "execution_context": orjson.dumps(simplified_context).decode() if simplified_context else "No previous results.",
+                    "error_analysis": error_analysis_text if error_analysis_text else "No previous errors."
+                }
+                # Keep the prompt inside the model's context window so the
+                # call never fails on length and re-enters the retry loop.
+                prompt_inputs.update(_fit_to_budget(
+                    {name: prompt_inputs[name] for name in _SECTION_PRIORITY},
+                    _PROMPT_TOKEN_BUDGET,
+                ))
+
                 response = await asyncio.wait_for(
-                    asyncio.get_event_loop().run_in_executor(
-                        None,
-                        lambda: chain.invoke({
-                            "metadata_json": json.dumps(metadata_simplified, indent=2),
-                            "full_plan_json": json.dumps(state.plan.steps, indent=2),
-                            "current_step_from_plan": current_step,
-                            "log_of_past_steps": "\n".join(state.execution_history[-3:]) if state.execution_history else "No previous steps.",  # Only last 3 steps
-                            "available_variables": ", ".join(state.available_variables),
-                            "execution_context": json.dumps(simplified_context, indent=2) if simplified_context else "No previous results.",
-                            "error_analysis": error_analysis_text if error_analysis_text else "No previous errors."
-                        })
-                    ),
+                    chain.ainvoke(prompt_inputs),
                     timeout=60.0  # 45 second hard timeout
                 )
                 api_elapsed = time.time() - api_start
-                print(f"✅ OpenAI API call completed successfully in {api_elapsed:.2f}s")
+                logger.debug("✅ OpenAI API call completed successfully in %.2fs", api_elapsed)
             except asyncio.TimeoutError:
-                print(f"❌ OpenAI API call timed out after 45 seconds")
+                logger.error("❌ OpenAI API call timed out after 45 seconds")
                 # Provide a fallback simple code for step 2
                 if state.current_step_index == 1:  # Second step (0-indexed)
-                    print("🔄 Using fallback code for degrowth calculation")
+                    logger.debug("🔄 Using fallback code for degrowth calculation")
                     state.current_thought = "Calculating degrowth by comparing first and last revenue values for each city"
                     state.current_code = """# Calculate degrowth for each city
 city_growth = []
@@ -294,99 +401,60 @@ print(f"\\nCity with maximum degrowth: {max_degrowth_city['City']} ({max_degrowt
                 else:
                     raise Exception("OpenAI API timeout")
             except Exception as e:
-                print(f"❌ OpenAI API call failed: {e}")
+                logger.error("❌ OpenAI API call failed: %s", e)
                 raise
-            print("#"*40)
-            print(f'response from code generation agent: {response}')
+            logger.debug("response from code generation agent: %s", response)
 
             # Parse response content (now it's text instead of structured)
             response_content = response.content if hasattr(response, 'content') else str(response)
-            print("#"*40)
-            print(f'response content: {response_content}')
+            logger.debug("response content: %s", response_content)
 
             # Parse the response to extract thought and code
             # The response comes wrapped in markdown code blocks
             try:
-                # Extract JSON from markdown code blocks
-                def extract_json_from_markdown(content: str) -> str:
-                    """Extract JSON content from markdown code blocks."""
-                    content = content.strip()
-
-                    # Check if content is wrapped in ```json code blocks
-                    if '```json' in content:
-                        start_marker = '```json\n'
-                        end_marker = '\n```'
-
-                        start_idx = content.find(start_marker)
-                        if start_idx != -1:
-                            start_idx += len(start_marker)
-                            end_idx = content.find(end_marker, start_idx)
-                            if end_idx != -1:
-                                return content[start_idx:end_idx].strip()
-
-                    # If no code blocks, try to find JSON directly
-                    if content.strip().startswith('{'):
-                        return content.strip()
-
-                    return content
-
                 # Extract and parse JSON
-                json_content = extract_json_from_markdown(response_content)
-                print(f"🔍 Extracted JSON: {json_content[:200]}...")
+                json_content = _extract_json(response_content)
+                logger.debug("🔍 Extracted JSON: %s...", json_content[:200])
 
                 parsed_response = json.loads(json_content)
                 state.current_thought = parsed_response.get('thought', 'No thought provided')
                 state.current_code = parsed_response.get('code', 'No code provided')
 
-                print(f"✅ Successfully parsed thought and code")
+                logger.debug("✅ Successfully parsed thought and code")
 
             except Exception as parse_error:
-                print(f"⚠️ Failed to parse JSON response: {parse_error}")
-                print(f"🔍 Raw response content: {response_content[:500]}...")
+                logger.warning("⚠️ Failed to parse JSON response: %s", parse_error)
+                logger.debug("🔍 Raw response content: %s...", response_content[:500])
 
                 # Fallback: try to extract code from any code blocks
                 state.current_thought = "Generated code for the current step"
-                if '```python' in response_content:
-                    # Extract Python code blocks
-                    lines = response_content.split('\n')
-                    code = ""
-                    in_code_block = False
-
-                    for line in lines:
-                        if line.strip().startswith('```python'):
-                            in_code_block = True
-                            continue
-                        elif line.strip() == '```':
-                            in_code_block = False
-                            continue
-                        elif in_code_block:
-                            code += line + '\n'
-
-                    state.current_code = code.strip() or response_content.strip()
-                else:
-                    state.current_code = response_content.strip()
+                code_match = _CODE_BLOCK_RE.search(response_content)
+                state.current_code = (code_match.group(1) if code_match else response_content).strip()
             
-            print(f"🧠 Agent thought: {state.current_thought}")
-            print(f"📝 Generated code:\n{state.current_code}")
+            logger.debug("🧠 Agent thought: %s", state.current_thought)
+            logger.debug("📝 Generated code:\n%s", state.current_code)
             
             return state
             
         except Exception as e:
-            print(f"❌ Code Generation Agent error: {e}")
+            logger.error("❌ Code Generation Agent error: %s", e)
             raise
     
     async def _code_executor(self, state: AgentState) -> AgentState:
         """Execute generated code in Jupyter kernel."""
-        print(f"🚀 Code Executor: Executing code for step {state.current_step_index + 1}")
+        logger.debug("🚀 Code Executor: Executing code for step %s", state.current_step_index + 1)
         
         try:
-            # Get kernel manager
-            kernel_manager = self.session_manager.get_kernel_manager(state.session_id)
+            # Get kernel manager, preferring the lookup started during codegen
+            prefetch = self._kernel_prefetch.pop(state.session_id, None)
+            if prefetch is not None:
+                kernel_manager = await prefetch
+            else:
+                kernel_manager = self.session_manager.get_kernel_manager(state.session_id)
             if not kernel_manager:
                 raise RuntimeError(f"No kernel manager found for session {state.session_id}")
-            print('#'*40)
             # print(f"state before execution: {state}")
-            print(f"state.current_code: {state.current_code}")
+            logger.debug("state.current_code: %s", state.current_code)
             # Execute code
             execution_result = await self.jupyter_service.execute_code(
                 kernel_manager = kernel_manager , code=
@@ -397,7 +465,7 @@ print(f"\\nCity with maximum degrowth: {max_degrowth_city['City']} ({max_degrowt
             state.last_execution_result = execution_result
             
             if execution_result.success:
-                print(f"✅ Code executed successfully")
+                logger.debug("✅ Code executed successfully")
 
                 # Store execution results and extract variables
                 step_description = state.plan.steps[state.current_step_index]
@@ -406,6 +474,7 @@ print(f"\\nCity with maximum degrowth: {max_degrowth_city['City']} ({max_degrowt
                 new_variables = self._extract_variables_from_code(state.current_code)
                 state.available_variables.extend(new_variables)
                 state.available_variables = list(set(state.available_variables))  # Remove duplicates
+                state.available_vars_str = ", ".join(state.available_variables)
 
                 # Store execution context
                 execution_summary = {
@@ -418,8 +487,20 @@ print(f"\\nCity with maximum degrowth: {max_degrowth_city['City']} ({max_degrowt
                     }
                 }
                 state.execution_context.update(execution_summary)
-                print('#'*40)
-                print(f"state.execution_context: {state.execution_context}")
+
+                # Maintain the pre-truncated context incrementally so downstream
+                # agents never re-walk the full execution context per LLM call
+                output = execution_result.stdout or ""
+                if len(output) > 500:
+                    output = output[:500] + "... (truncated)"
+                state.simplified_execution_context[f"step_{state.current_step_index + 1}"] = {
+                    "description": step_description,
+                    "code": state.current_code,
+                    "output": output,
+                    "variables_created": new_variables,
+                    "success": True
+                }
+                logger.debug("state.execution_context: %s", state.execution_context)
                 # Store intermediate results if they contain tables or charts
                 if execution_result.stdout :
                     intermediate_result = {
@@ -432,6 +513,7 @@ print(f"\\nCity with maximum degrowth: {max_degrowth_city['City']} ({max_degrowt
 
                 # Add to execution history
                 state.execution_history.append(f"Step {state.current_step_index + 1}: {step_description} - SUCCESS (Variables: {', '.join(new_variables)})")
+                state.execution_history_tail = state.execution_history[-3:]
 
                 # Move to next step
                 state.current_step_index += 1
@@ -442,14 +524,13 @@ print(f"\\nCity with maximum degrowth: {max_degrowth_city['City']} ({max_degrowt
                 # if hasattr(state, 'current_thought'):
                 #     delattr(state, 'current_thought')
             else:
-                print(f"❌ Code execution failed: {execution_result.stderr}")
+                logger.error("❌ Code execution failed: %s", execution_result.stderr)
                 state.error_count += 1
-            print('#'*40)
-            print(f"state after execution: {state}")
+            logger.debug("state after execution: %s", state)
             return state
             
         except Exception as e:
-            print(f"❌ Code Executor error: {e}")
+            logger.error("❌ Code Executor error: %s", e)
             state.error_count += 1
            
             from ..models.phase2_models import ExecutionResult
@@ -464,32 +545,30 @@ print(f"\\nCity with maximum degrowth: {max_degrowth_city['City']} ({max_degrowt
     
     async def _error_analysis_agent(self, state: AgentState) -> AgentState:
         """Error analysis agent for debugging failed code."""
-        print(f"🔍 Error Analysis Agent: Analyzing error for step {state.current_step_index + 1}")
+        logger.debug("🔍 Error Analysis Agent: Analyzing error for step %s", state.current_step_index + 1)
         
         try:
             failed_step = state.plan.steps[state.current_step_index]
             
             # Create prompt
-            llm_structured = self.llm.with_structured_output(ErrorAnalysisResponse)
-            prompt = ChatPromptTemplate.from_template(ERROR_ANALYSIS_AGENT_PROMPT)
-            chain = prompt | llm_structured
+            chain = self._error_analysis_chain
             
             # Analyze error
-            response = chain.invoke({
+            response = await chain.ainvoke({
                 "failed_step": failed_step,
                 "code_that_failed": state.current_code,
                 "stderr_from_kernel": state.last_execution_result.stderr,
-                "available_variables": ", ".join(state.available_variables),
-                "execution_context": json.dumps(state.execution_context, indent=2) if state.execution_context else "No previous results.",
-                "metadata_json": json.dumps(state.dataset_metadata, indent=2)
+                "available_variables": state.available_vars_str,
+                "execution_context": orjson.dumps(state.execution_context).decode() if state.execution_context else "No previous results.",
+                "metadata_json": orjson.dumps(state.dataset_metadata).decode()
             })
             
             # Parse response
             # response_content = response.content if hasattr(response, 'content') else str(response)
             # error_analysis = validate_json_content(response_content)
             
-            print(f"🔬 Error diagnosis: {response.diagnosis}")
-            print(f"💡 Suggested fix: {response.suggestion}")
+            logger.debug("🔬 Error diagnosis: %s", response.diagnosis)
+            logger.debug("💡 Suggested fix: %s", response.suggestion)
             
             # Store error analysis for code generator to use
             state.error_analysis = response
@@ -497,156 +576,129 @@ print(f"\\nCity with maximum degrowth: {max_degrowth_city['City']} ({max_degrowt
             return state
             
         except Exception as e:
-            print(f"❌ Error Analysis Agent error: {e}")
+            logger.error("❌ Error Analysis Agent error: %s", e)
             raise
     
     def _should_continue_execution(self, state: AgentState) -> str:
         """Determine next step in the workflow."""
-        print(f"🤔 Deciding next step... Current step: {state.current_step_index}, Total steps: {len(state.plan.steps)}")
+        logger.debug("🤔 Deciding next step... Current step: %s, Total steps: %s", state.current_step_index, len(state.plan.steps))
         
         # Check if we have an execution result
         if not hasattr(state, 'last_execution_result'):
-            print("⚠️ No execution result found, continuing to code generation")
+            logger.warning("⚠️ No execution result found, continuing to code generation")
             return "continue"
         
         # If execution failed and we haven't exceeded retry limit
         if not state.last_execution_result.success:
             if state.error_count >= state.max_retries:
-                print(f"❌ Max retries ({state.max_retries}) exceeded, completing with error")
+                logger.error("❌ Max retries (%s) exceeded, completing with error", state.max_retries)
                 return "complete"
-            print(f"🔄 Execution failed, going to error analysis (attempt {state.error_count}/{state.max_retries})")
+            logger.debug("🔄 Execution failed, going to error analysis (attempt %s/%s)", state.error_count, state.max_retries)
             return "error"
         
         # If all steps completed, go to chart generation
         if state.current_step_index >= len(state.plan.steps):
-            print("📊 All steps completed, proceeding to chart generation")
+            logger.debug("📊 All steps completed, proceeding to chart generation")
             return "chart"
         
         # Continue with next step
-        print(f"➡️ Continuing to next step ({state.current_step_index + 1}/{len(state.plan.steps)})")
+        logger.debug("➡️ Continuing to next step (%s/%s)", state.current_step_index + 1, len(state.plan.steps))
         return "continue"
 
     async def _chart_generation_agent(self, state: AgentState) -> AgentState:
         """Chart generation agent for creating visualizations."""
-        print("📊 Chart Generation Agent: Creating visualization")
+        logger.debug("📊 Chart Generation Agent: Creating visualization")
 
         try:
             # Check if we have data to visualize
-            has_data = False
             final_data_info = {}
 
             # First try to get data from intermediate results
-            if state.intermediate_results:
-                print(f"🔍 Checking intermediate results for table data to generate chart")
-                print(f"state.intermediate_results: {state.intermediate_results}")
-                for result in state.intermediate_results:
-                    if result.get("type") == "table" and result.get("content"):
-                        has_data = True
-                        final_data_info = {
-                            "table_data": result.get("content"),
-                            "variables_created": result.get("variables", [])
-                        }
-                        print(f"📊 Found table data in intermediate results: {result.get('variables', [])}")
-                        break
+            for result in state.intermediate_results:
+                if result.get("type") == "table" and result.get("content"):
+                    final_data_info = {
+                        "table_data": result.get("content"),
+                        "variables_created": result.get("variables", [])
+                    }
+                    logger.debug("📊 Found table data in intermediate results: %s", result.get('variables', []))
+                    break
 
             # Fallback to last execution result stdout
-            if not has_data and hasattr(state, 'last_execution_result') and state.last_execution_result.success:
+            if not final_data_info and state.last_execution_result and state.last_execution_result.success:
                 if state.last_execution_result.stdout:
-                    print(f"🔍 Checking last execution result for table data to generate chart")
-                    print(f"state.last_execution_result: {state.last_execution_result}")
-                    has_data = True
                     final_data_info = {
                         "table_data": state.last_execution_result.stdout,
                         "variables_created": state.available_variables
                     }
-                    print(f"📊 Using last execution result stdout for chart generation")
+                    logger.debug("📊 Using last execution result stdout for chart generation")
                 else:
-                    print(f"ℹ️ No stdout in last execution result")
+                    logger.debug("ℹ️ No stdout in last execution result")
 
-            print(f"📊 Chart generation data check: has_data={has_data}, available_variables={state.available_variables}")
+            if not final_data_info:
+                # Short-circuit: no prompt or structured-output chain needed
+                logger.warning("⚠️ No data available for chart generation (%s intermediate results)", len(state.intermediate_results))
+                state.chart_code = None
+                return state
 
-            if has_data:
-                print(f"📊 Proceeding with chart generation...")
-                print(f"📊 Available variables: {state.available_variables}")
-                print(f"📊 Final data info keys: {list(final_data_info.keys())}")
+            logger.debug("📊 Proceeding with chart generation...")
+            logger.debug("📊 Available variables: %s", state.available_variables)
 
-                # Create prompt
-                llm_structured = self.llm.with_structured_output(ChartGenerationResponse)
-                prompt = ChatPromptTemplate.from_template(CHART_GENERATION_AGENT_PROMPT)
-                chain = prompt | llm_structured
+            chain = self._chart_generation_chain
 
-                # Generate chart code with timeout
-                import asyncio
-                import time
-                
-                try:
-                    print("🔄 Calling OpenAI API for chart generation...")
-                    api_start = time.time()
-                    
-                    # Simplify execution context for chart generation
-                    simplified_context = {}
-                    if state.execution_context:
-                        print('#'*40)
-                        print(f"state.execution_context: {state.execution_context}")
-                        for key, value in list(state.execution_context.items())[-2:]:  # Only last 2 steps
-                            if isinstance(value, dict):
-                                simplified_value = {k: v for k, v in value.items() if k != 'output'}
-                                if 'output' in value and len(str(value['output'])) > 200:
-                                    simplified_value['output'] = str(value['output'])[:200] + "..."
-                                elif 'output' in value:
-                                    simplified_value['output'] = value['output']
-                                simplified_context[key] = simplified_value
-                                
-                    
-                    chart_response = await asyncio.wait_for(
-                        asyncio.get_event_loop().run_in_executor(
-                            None,
-                            lambda: chain.invoke({
-                                "user_query": state.user_query,
-                                "available_variables": ", ".join(state.available_variables[-5:]),  # Only last 5 variables
-                                "execution_context": json.dumps(simplified_context, indent=2) if simplified_context else "No previous results.",
-                                "final_dataframe_json": json.dumps(final_data_info, indent=2) if len(json.dumps(final_data_info)) < 1000 else '{"note": "Data too large, use available variables"}'
-                            })
-                        ),
-                        timeout=30.0  # 30 second timeout for chart generation
-                    )
-                    
-                    api_elapsed = time.time() - api_start
-                    print(f"✅ Chart generation API call completed in {api_elapsed:.2f}s")
-                    
-                    # Parse response
-                    print(f"📊 Chart response: {chart_response}")
-                    if hasattr(chart_response, 'code'):
-                        state.chart_code = chart_response.code
-                        print(f"📈 Chart code generated:\n{state.chart_code}")
-                    else:
-                        print(f"❌ Chart response missing 'code' attribute: {chart_response}")
-                        state.chart_code = None
-                        
-                except asyncio.TimeoutError:
-                    print("❌ Chart generation timed out after 30 seconds")
-                    print("🔄 Using fallback chart code")
-                    
+            # Generate chart code with timeout
+            import asyncio
+            import time
 
-            else:
-                print("⚠️ No data available for chart generation")
-                print(f"⚠️ Intermediate results: {len(state.intermediate_results)} items")
-                print(f"⚠️ Last execution result exists: {hasattr(state, 'last_execution_result')}")
-                if hasattr(state, 'last_execution_result'):
-                    print(f"⚠️ Last execution success: {state.last_execution_result.success}")
-                    print(f"⚠️ Last execution stdout length: {len(state.last_execution_result.stdout) if state.last_execution_result.stdout else 0}")
-                state.chart_code = None
+            try:
+                logger.debug("🔄 Calling OpenAI API for chart generation...")
+                api_start = time.time()
+
+                # Reuse the pre-truncated context maintained by _code_executor,
+                # keeping only the last 2 steps for the chart prompt. Walk the
+                # keys from the end instead of materializing the full list.
+                simplified_context = {}
+                if state.simplified_execution_context:
+                    recent_keys = list(islice(reversed(state.simplified_execution_context), 2))[::-1]
+                    simplified_context = {
+                        key: state.simplified_execution_context[key] for key in recent_keys
+                    }
+
+                chart_response = await asyncio.wait_for(
+                    chain.ainvoke({
+                        "user_query": state.user_query,
+                        "available_variables": ", ".join(state.available_variables[-5:]),  # Only last 5 variables
+                        "execution_context": orjson.dumps(simplified_context).decode() if simplified_context else "No previous results.",
+                        "final_dataframe_json": orjson.dumps(final_data_info).decode() if len(orjson.dumps(final_data_info)) < 1000 else '{"note": "Data too large, use available variables"}'
+                    }),
+                    timeout=30.0  # 30 second timeout for chart generation
+                )
+
+                api_elapsed = time.time() - api_start
+                logger.debug("✅ Chart generation API call completed in %.2fs", api_elapsed)
+
+                # Parse response
+                logger.debug("📊 Chart response: %s", chart_response)
+                if hasattr(chart_response, 'code'):
+                    state.chart_code = chart_response.code
+                    logger.debug("📈 Chart code generated:\n%s", state.chart_code)
+                else:
+                    logger.error("❌ Chart response missing 'code' attribute: %s", chart_response)
+                    state.chart_code = None
+
+            except asyncio.TimeoutError:
+                logger.error("❌ Chart generation timed out after 30 seconds")
+                logger.debug("🔄 Using fallback chart code")
 
             return state
 
         except Exception as e:
-            print(f"❌ Chart Generation Agent error: {e}")
+            logger.error("❌ Chart Generation Agent error: %s", e)
             state.chart_code = None
             return state
 
     async def _final_response_agent(self, state: AgentState) -> AgentState:
         """Final response agent for summarizing results."""
-        print("📝 Final Response Agent: Creating summary")
+        logger.debug("📝 Final Response Agent: Creating summary")
 
         try:
             # Prepare final data from execution context and intermediate results
@@ -654,39 +706,32 @@ print(f"\\nCity with maximum degrowth: {max_degrowth_city['City']} ({max_degrowt
 
             # Get data from intermediate results
             if state.intermediate_results:
-                print("Getting data from intermediate results for final response")
-                data_parts = []
-                print('#'*40)
-                print("Intermediate results:", state.intermediate_results)
-                for result in state.intermediate_results:
-                    if result.get("type") == "table":
-                        data_parts.append(f"**{result.get('step', 'Step')} Results:**\n{result.get('content', '')}")
-
+                data_parts = [
+                    f"**{result.get('step', 'Step')} Results:**\n{result.get('content', '')}"
+                    for result in state.intermediate_results
+                    if result.get("type") == "table"
+                ]
                 if data_parts:
-                    print('#'*40)
-                    print('data parts to be added for final response from previous steps',data_parts)
                     final_data_markdown = "\n\n".join(data_parts)
 
             # Fallback to last execution result
-            elif hasattr(state, 'last_execution_result') and state.last_execution_result.success:
-                print("Intermediate results not available, using last execution result for final response")
+            elif state.last_execution_result and state.last_execution_result.success:
+                logger.debug("Intermediate results not available, using last execution result for final response")
                 if state.last_execution_result.stdout:
                     final_data_markdown = state.last_execution_result.stdout
-                    print('#'*40)
-                    print('data parts to be added for final response from last execution result',final_data_markdown)
 
-            # Determine chart availability
-            chart_available = any(result.get("type") == "chart_html" for result in state.intermediate_results)
+            # Determine chart availability. chart_code is set as soon as the
+            # chart agent succeeds, so this stays correct when chart execution
+            # overlaps the final-response call in the streaming path.
+            chart_available = bool(state.chart_code) or any(
+                result.get("type") == "chart_html" for result in state.intermediate_results
+            )
             chart_message = "I have also generated an interactive chart to help visualize this information." if chart_available else ""
 
-            # Create prompt
-            
-            prompt = ChatPromptTemplate.from_template(FINAL_RESPONSE_AGENT_PROMPT)
-            chain = prompt | self.llm
-            print('#'*40)
-            print('Invoking final response agent llm')
+            chain = self._final_response_chain
+            logger.debug("Invoking final response agent llm")
             # Generate final response
-            response = chain.invoke({
+            response = await chain.ainvoke({
                 "user_query": state.user_query,
                 "final_data_as_markdown": final_data_markdown,
                 "chart_available_boolean": str(chart_available),
@@ -697,81 +742,93 @@ print(f"\\nCity with maximum degrowth: {max_degrowth_city['City']} ({max_degrowt
             response_content = response.content if hasattr(response, 'content') else str(response)
             state.final_response = response_content
 
-            print(f"✅ Final response generated: {response_content[:200]}...")
+            logger.debug("✅ Final response generated: %s...", response_content[:200])
 
             return state
 
         except Exception as e:
-            print(f"❌ Final Response Agent error: {e}")
+            logger.error("❌ Final Response Agent error: %s", e)
             state.final_response = f"I apologize, but I encountered an error while processing your query: {str(e)}"
             return state
 
     async def process_query(self, state: AgentState) -> AgentState:
         """Process a user query through the multi-agent workflow."""
-        print(f"🚀 Starting multi-agent query processing for session: {state.session_id}")
-        print(f"❓ User query: {state.user_query}")
+        logger.debug("🚀 Starting multi-agent query processing for session: %s", state.session_id)
+        logger.debug("❓ User query: %s", state.user_query)
 
         try:
-            # Run the workflow
-            result = await self.graph.ainvoke(state)
+            # Run the workflow, checkpointed per session so continuations
+            # pick up the persisted plan and execution context
+            result = await self.graph.ainvoke(
+                state,
+                config={"configurable": {"thread_id": state.session_id}}
+            )
 
-            print("✅ Multi-agent workflow completed successfully")
+            logger.debug("✅ Multi-agent workflow completed successfully")
             return result
 
         except Exception as e:
-            print(f"❌ Multi-agent workflow error: {e}")
+            logger.error("❌ Multi-agent workflow error: %s", e)
             # Return state with error message
             state.final_response = f"I apologize, but I encountered an error while processing your query: {str(e)}"
             return state
 
     def _extract_variables_from_code(self, code: str) -> List[str]:
         """Extract variable names that are being assigned in the code."""
-        import re
-
         variables = []
         if not code:
             return variables
 
-        # Look for variable assignments (simple pattern)
-        # Matches: variable_name = something
-        assignment_pattern = r'^(\w+)\s*='
-
-        for line in code.split('\n'):
-            line = line.strip()
-            if line and not line.startswith('#') and not line.startswith('import') and not line.startswith('print'):
-                match = re.match(assignment_pattern, line)
-                if match:
-                    var_name = match.group(1)
-                    # Skip common non-variable assignments
-                    if var_name not in ['fig', 'plt', 'ax'] and not var_name.startswith('_'):
-                        variables.append(var_name)
-
-        print(f"🔍 Extracted variables from code: {variables}")
+        # Parse once with ast instead of regex-scanning each line: accurate
+        # in linear time, and no false positives inflating available_variables
+        try:
+            tree = ast.parse(code)
+        except SyntaxError:
+            return variables
+
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Assign):
+                for target in node.targets:
+                    # Unpack tuple/list targets so `a, b = ...` is captured too
+                    if isinstance(target, (ast.Tuple, ast.List)):
+                        names = [el for el in target.elts if isinstance(el, ast.Name)]
+                    elif isinstance(target, ast.Name):
+                        names = [target]
+                    else:
+                        continue
+                    for name in names:
+                        var_name = name.id
+                        # Skip common non-variable assignments
+                        if var_name not in _SKIP_VARS and not var_name.startswith('_'):
+                            variables.append(var_name)
+
+        logger.debug("🔍 Extracted variables from code: %s", variables)
         return variables
 
 
 # Global multi-agent service instance (lazy)
 _multi_agent_service: Optional[MultiAgentService] = None
+_service_lock = threading.Lock()
 
 
 def get_multi_agent_service() -> MultiAgentService:
     """Get the global multi-agent service instance with lazy initialization."""
     global _multi_agent_service
-    print(f"🔍 Current _multi_agent_service: {_multi_agent_service}")
-    print(f"🔍 Thread ID: {threading.get_ident()}")
+    # Double-checked locking: first requests racing through FastAPI would
+    # otherwise each build their own service (LLM client init is seconds)
     if _multi_agent_service is None:
-        print("🔄 Initializing MultiAgentService (lazy)...")
-        try:
-            import time
-            start_time = time.time()
-            _multi_agent_service = MultiAgentService()
-            end_time = time.time()
-            print(f"✅ MultiAgentService initialization completed in {end_time - start_time:.2f} seconds")
-        except Exception as e:
-            print(f"❌ MultiAgentService initialization failed: {e}")
-            import traceback
-            traceback.print_exc()
-            raise
-    else:
-        print("♻️ Using existing MultiAgentService instance")
+        with _service_lock:
+            if _multi_agent_service is None:
+                logger.debug("🔄 Initializing MultiAgentService (lazy)...")
+                try:
+                    import time
+                    start_time = time.time()
+                    _multi_agent_service = MultiAgentService()
+                    end_time = time.time()
+                    logger.debug("✅ MultiAgentService initialization completed in %.2f seconds", end_time - start_time)
+                except Exception as e:
+                    logger.error("❌ MultiAgentService initialization failed: %s", e)
+                    import traceback
+                    traceback.print_exc()
+                    raise
     return _multi_agent_service
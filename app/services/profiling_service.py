@@ -2,80 +2,123 @@
 
 from __future__ import annotations
 
+import logging
 import os
+import re
 import time
-from typing import Any, Dict, List, Tuple
-
-import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Dict, List, Tuple
 
 from ..config.settings import get_settings
 from ..models.schemas import AgentInput
-from ..utils.data_utils import (
-    convert_to_json_serializable,
-    get_categorical_unique_values,
-    get_data_sample,
-    get_missing_values_report,
-    safe_describe_dataframe,
-)
+
+logger = logging.getLogger(__name__)
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# pandas (and the data_utils helpers that pull it in) are imported lazily:
+# this module is loaded with the API routes at startup, and paying the
+# ~300ms pandas import there delays every cold start even when no
+# profiling request ever arrives.
+
+
+# Strings that plausibly parse as numbers (int, float, scientific notation)
+_NUMERIC_RE = re.compile(r"^[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?$")
+
+# Common explicit datetime formats tried before the slow dateutil fallback
+_DATETIME_FORMATS = ("%Y-%m-%d", "%m/%d/%Y", "%Y-%m-%dT%H:%M:%S")
 
 
 class ProfilingService:
     """Service for comprehensive dataset profiling and type analysis."""
 
+    # Boolean-like vocabulary mapped straight to its converted value
+    _BOOL_MAP = {
+        "true": True, "false": False,
+        "yes": True, "no": False,
+        "y": True, "n": False,
+        "1": True, "0": False,
+        "on": True, "off": False,
+        "enabled": True, "disabled": False,
+        "active": True, "inactive": False,
+    }
+
     def __init__(self, settings=None):
         """Initialize profiling service with settings."""
         self.settings = settings or get_settings()
         self.numeric_threshold = self.settings.numeric_threshold
         self.datetime_threshold = self.settings.datetime_threshold
         self.categorical_threshold = self.settings.categorical_threshold
+        # Per-frame column analysis results, keyed by (id(df), column name),
+        # so analyze_column_types and _infer_type_corrections share one pass
+        self._column_cache: Dict[Tuple[int, str], Dict[str, Any]] = {}
 
-    def profile_dataset(self, file_path: str) -> Tuple[Dict[str, Any], AgentInput]:
+    def profile_dataset(self, file_path: str, full_scan: bool = False) -> Tuple[Dict[str, Any], AgentInput]:
         """
         Perform comprehensive dataset profiling.
-        
+
+        Type inference and statistics run on the first profile_sample_rows
+        rows unless full_scan is set; conversion ratios barely move past that
+        sample size while GB-scale CSVs stop costing a full parse.
+
         Returns:
             Tuple of (initial_analysis, agent_input)
         """
         if not os.path.exists(file_path):
             raise FileNotFoundError(file_path)
 
-        print(f"  📋 Loading CSV file...")
+        from ..utils.data_utils import (
+            get_categorical_unique_values,
+            get_data_sample,
+            get_missing_values_report,
+            safe_describe_dataframe,
+        )
+
+        logger.debug("  📋 Loading CSV file...")
         csv_start = time.time()
-        df = pd.read_csv(file_path)
+        sample_rows = None if full_scan else self.settings.profile_sample_rows
+        df = self._read_csv(file_path, nrows=sample_rows)
         csv_time = time.time() - csv_start
-        print(f"  📋 CSV loaded in {csv_time:.3f}s - Shape: {df.shape}")
-        
-        # Basic dataset information
-        size = {"rows": int(df.shape[0]), "columns": int(df.shape[1])}
+        logger.debug("  📋 CSV loaded in %.3fs - Shape: %s", csv_time, df.shape)
+
+        # Basic dataset information. When the sample may have truncated the
+        # file, recover the true row count with a raw line scan — a single
+        # byte pass, far cheaper than parsing the remaining rows.
+        total_rows = int(df.shape[0])
+        if sample_rows is not None and total_rows == sample_rows:
+            with open(file_path, "rb") as f:
+                total_rows = max(sum(1 for _ in f) - 1, 0)
+        size = {"rows": total_rows, "columns": int(df.shape[1])}
         
         # Generate comprehensive analysis
-        print(f"  🔍 Analyzing missing values...")
+        logger.debug("  🔍 Analyzing missing values...")
         missing_start = time.time()
         missing_values = get_missing_values_report(df)
         missing_time = time.time() - missing_start
-        print(f"  🔍 Missing values analysis completed in {missing_time:.3f}s")
+        logger.debug("  🔍 Missing values analysis completed in %.3fs", missing_time)
         
-        print(f"  🔧 Inferring type corrections...")
+        logger.debug("  🔧 Inferring type corrections...")
         type_start = time.time()
         type_corrections = self._infer_type_corrections(df)
         type_time = time.time() - type_start
-        print(f"  🔧 Type corrections analysis completed in {type_time:.3f}s")
+        logger.debug("  🔧 Type corrections analysis completed in %.3fs", type_time)
         
-        print(f"  📊 Generating statistics...")
+        logger.debug("  📊 Generating statistics...")
         stats_start = time.time()
         statistics = safe_describe_dataframe(df)
         stats_time = time.time() - stats_start
-        print(f"  📊 Statistics generated in {stats_time:.3f}s")
+        logger.debug("  📊 Statistics generated in %.3fs", stats_time)
         
         # Prepare agent input
-        print(f"  🎯 Preparing agent input...")
+        logger.debug("  🎯 Preparing agent input...")
         agent_prep_start = time.time()
         columns = [str(c) for c in df.columns.tolist()]
         column_data_types = {str(col): str(dtype) for col, dtype in df.dtypes.items()}
         categorical_values = get_categorical_unique_values(df)
         data_sample = get_data_sample(df)
         agent_prep_time = time.time() - agent_prep_start
-        print(f"  🎯 Agent input prepared in {agent_prep_time:.3f}s")
+        logger.debug("  🎯 Agent input prepared in %.3fs", agent_prep_time)
         
         initial_analysis = {
             "size": size,
@@ -95,6 +138,30 @@ class ProfilingService:
         
         return initial_analysis, agent_input
 
+    def _read_csv(self, file_path: str, nrows: int | None = None) -> pd.DataFrame:
+        """Load a CSV, using the multi-threaded pyarrow reader for large files."""
+        import pandas as pd
+
+        # A bounded read is already cheap; pyarrow has no nrows equivalent
+        if nrows is not None:
+            return pd.read_csv(file_path, nrows=nrows)
+
+        # Below ~1MB thread setup overhead dominates; keep the pandas parser
+        if os.path.getsize(file_path) < 1_000_000:
+            return pd.read_csv(file_path)
+
+        try:
+            from pyarrow import csv as pacsv
+
+            table = pacsv.read_csv(
+                file_path,
+                read_options=pacsv.ReadOptions(use_threads=True),
+            )
+            return table.to_pandas()
+        except Exception as e:
+            logger.warning("  ⚠️ pyarrow CSV read failed (%s), falling back to pandas", e)
+            return pd.read_csv(file_path)
+
     def analyze_column_types(self, df: pd.DataFrame) -> Dict[str, Any]:
         """
         Comprehensive column type analysis with correction suggestions.
@@ -109,7 +176,7 @@ class ProfilingService:
         }
         
         for column_name in df.columns:
-            column_info = self._analyze_single_column(df[column_name], column_name)
+            column_info = self._analyze_column_cached(df, column_name)
             results['column_analysis'].append(column_info)
             
             # Add to suggestions if correction is recommended
@@ -131,32 +198,54 @@ class ProfilingService:
 
     def _analyze_single_column(self, series: pd.Series, column_name: str) -> Dict[str, Any]:
         """Analyze a single column for type suggestions."""
+        from ..utils.data_utils import convert_to_json_serializable
+
+        # Scan the column once: the null mask is a full pass, so compute it a
+        # single time and reuse everywhere below. The unique count is capped
+        # at categorical_threshold + 1 — nothing downstream distinguishes
+        # cardinalities beyond the threshold, and the capped walk exits as
+        # soon as a high-cardinality column reveals itself.
+        n = len(series)
+        null_mask = series.isna()
+        null_count = int(null_mask.sum())
+        non_null = series[~null_mask]
+        unique_count = self._nunique_at_most(non_null, self.categorical_threshold)
+
         column_info = {
             'column_name': column_name,
             'current_type': str(series.dtype),
             'suggested_type': str(series.dtype),
-            'null_count': int(series.isnull().sum()),
-            'null_percentage': float(series.isnull().sum() / len(series) * 100),
-            'unique_count': int(series.nunique()),
-            'unique_percentage': float(series.nunique() / len(series) * 100),
+            'null_count': null_count,
+            'null_percentage': float(null_count / n * 100),
+            'unique_count': unique_count,
+            'unique_percentage': float(unique_count / n * 100),
             'sample_values': [],
             'confidence': 0.0,
             'reason': 'No conversion needed'
         }
-        
+
         # Get sample values (non-null)
-        non_null = series.dropna()
         if not non_null.empty:
-            sample_size = min(5, len(non_null))
-            column_info['sample_values'] = [
-                convert_to_json_serializable(val) for val in non_null.head(sample_size).tolist()
-            ]
+            column_info['sample_values'] = self._fast_sample(non_null, 5)
         
         # Skip analysis if mostly null
         if len(non_null) < 3:
             column_info['reason'] = 'Insufficient non-null data'
             return column_info
-        
+
+        # Low cardinality decides the column outright, so check it first:
+        # one already-computed nunique versus the full-column probes below
+        if (column_info['unique_count'] <= self.categorical_threshold and
+            column_info['unique_percentage'] < 50 and
+            str(series.dtype) in ['object', 'int64', 'float64']):
+
+            column_info.update({
+                'suggested_type': 'categorical',
+                'confidence': 1.0 - (column_info['unique_percentage'] / 100),
+                'reason': f"Low cardinality: {column_info['unique_count']} unique values ({column_info['unique_percentage']:.1f}%)"
+            })
+            return column_info
+
         # Only analyze object/string columns for conversions
         if str(series.dtype) == 'object':
             # Check for numeric conversion
@@ -192,129 +281,151 @@ class ProfilingService:
                 })
                 return column_info
 
-        # Check if should be categorical
-        if (column_info['unique_count'] <= self.categorical_threshold and
-            column_info['unique_percentage'] < 50 and
-            str(series.dtype) in ['object', 'int64', 'float64']):
-
-            column_info.update({
-                'suggested_type': 'categorical',
-                'confidence': 1.0 - (column_info['unique_percentage'] / 100),
-                'reason': f"Low cardinality: {column_info['unique_count']} unique values ({column_info['unique_percentage']:.1f}%)"
-            })
-
         return column_info
 
+    @staticmethod
+    def _fast_sample(series: pd.Series, n: int) -> List[Any]:
+        """Take the first n values as JSON-serializable Python objects."""
+        head = series.head(n)
+        # Plain numeric dtypes convert cleanly via tolist(); only object
+        # columns can carry values that need the generic converter
+        if head.dtype.kind in "iuf":
+            return head.tolist()
+
+        from ..utils.data_utils import convert_to_json_serializable
+
+        if head.dtype == object:
+            return [
+                v if isinstance(v, (str, int, float, bool)) else convert_to_json_serializable(v)
+                for v in head
+            ]
+        return [convert_to_json_serializable(v) for v in head]
+
+    @staticmethod
+    def _nunique_at_most(series: pd.Series, cap: int) -> int:
+        """Count unique values, returning cap + 1 as soon as cap is exceeded."""
+        seen = set()
+        for value in series.values:
+            seen.add(value)
+            if len(seen) > cap:
+                return cap + 1
+        return len(seen)
+
+    def _analyze_column_cached(self, df: pd.DataFrame, column_name: str) -> Dict[str, Any]:
+        """Analyze a column once per frame, caching by frame identity."""
+        key = (id(df), column_name)
+        cached = self._column_cache.get(key)
+        if cached is None:
+            cached = self._analyze_single_column(df[column_name], column_name)
+            self._column_cache[key] = cached
+        return cached
+
     def _infer_type_corrections(self, df: pd.DataFrame) -> List[Dict[str, Any]]:
         """Suggest column type corrections using comprehensive analysis."""
-        print(f"    🔍 Analyzing {len(df.columns)} columns for type corrections...")
+        logger.debug("    🔍 Analyzing %s columns for type corrections...", len(df.columns))
+
+        # Only object and numeric columns can yield a suggestion (conversion
+        # probes need object; categorical needs object/int64/float64), so
+        # filter by dtype in bulk before doing any per-column work
+        candidate_cols = df.select_dtypes(include=["object", "number"]).columns
+        if candidate_cols.empty:
+            return []
+
+        # Each worker reads a single column view and pandas releases the GIL
+        # inside its C routines, so wide frames scale across cores.
+        max_workers = min(os.cpu_count() or 1, len(candidate_cols))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(
+                executor.map(
+                    lambda column_name: self._analyze_column_cached(df, column_name),
+                    candidate_cols,
+                )
+            )
+
+        # Emit only columns where a change is suggested, in the schema the
+        # metadata report expects
         suggestions: List[Dict[str, Any]] = []
-        for i, column_name in enumerate(df.columns, 1):
-            if i % 10 == 0 or i == len(df.columns):
-                print(f"    🔍 Processed {i}/{len(df.columns)} columns...")
-            series = df[column_name]
-            current_type = str(series.dtype)
-
-            # Build base info
-            suggestion: Dict[str, Any] = {
-                "column_name": column_name,
-                "current_type": current_type,
-                "suggested_type": current_type,
-                "confidence": 0.0,
-                "reason": "No conversion needed",
-                "sample_values": [],
+        for column_info in results:
+            if column_info["suggested_type"] == column_info["current_type"]:
+                continue
+            suggestion = {
+                key: column_info[key]
+                for key in (
+                    "column_name",
+                    "current_type",
+                    "suggested_type",
+                    "confidence",
+                    "reason",
+                    "sample_values",
+                )
             }
-
-            non_null = series.dropna()
-            if not non_null.empty:
-                sample_size = min(5, len(non_null))
-                suggestion["sample_values"] = [
-                    convert_to_json_serializable(val) for val in non_null.head(sample_size).tolist()
-                ]
-
-            # Skip if very sparse
-            if len(non_null) < 3:
-                suggestion["reason"] = "Insufficient non-null data"
-            else:
-                # For object types, test numeric/datetime/boolean first
-                if current_type == "object":
-                    numeric_result = self._check_numeric_conversion(non_null)
-                    if numeric_result["convertible_ratio"] >= self.numeric_threshold:
-                        suggestion.update(
-                            {
-                                "suggested_type": "numeric",
-                                "confidence": numeric_result["convertible_ratio"],
-                                "reason": f"Can convert {numeric_result['convertible_ratio']:.1%} of values to numeric",
-                                "sample_converted": numeric_result["sample_converted"],
-                            }
-                        )
-                    else:
-                        datetime_result = self._check_datetime_conversion(non_null)
-                        if datetime_result["convertible_ratio"] >= self.datetime_threshold:
-                            suggestion.update(
-                                {
-                                    "suggested_type": "datetime",
-                                    "confidence": datetime_result["convertible_ratio"],
-                                    "reason": f"Can convert {datetime_result['convertible_ratio']:.1%} of values to datetime",
-                                    "sample_converted": datetime_result["sample_converted"],
-                                }
-                            )
-                        else:
-                            boolean_result = self._check_boolean_conversion(non_null)
-                            if boolean_result["is_boolean"]:
-                                suggestion.update(
-                                    {
-                                        "suggested_type": "boolean",
-                                        "confidence": 1.0,
-                                        "reason": f"Contains boolean-like values: {boolean_result['unique_values']}",
-                                        "sample_converted": boolean_result["sample_converted"],
-                                    }
-                                )
-
-                # Consider categorical for low-cardinality across typical types
-                unique_count = series.nunique(dropna=True)
-                unique_percentage = (unique_count / len(series) * 100) if len(series) else 0
-                if (
-                    unique_count <= self.categorical_threshold
-                    and unique_percentage < 50
-                    and current_type in ["object", "int64", "float64"]
-                ):
-                    suggestion.update(
-                        {
-                            "suggested_type": "categorical",
-                            "confidence": 1.0 - (unique_percentage / 100.0),
-                            "reason": f"Low cardinality: {unique_count} unique values ({unique_percentage:.1f}%)",
-                        }
-                    )
-
-            # Emit only if change suggested
-            if suggestion["suggested_type"] != suggestion["current_type"]:
-                suggestions.append(suggestion)
+            if "sample_converted" in column_info:
+                suggestion["sample_converted"] = column_info["sample_converted"]
+            suggestions.append(suggestion)
 
         return suggestions
 
     def _check_numeric_conversion(self, series: pd.Series) -> Dict[str, Any]:
         """Check if series can be converted to numeric."""
+        import pandas as pd
+
         result = {"convertible_ratio": 0.0, "sample_converted": []}
         try:
-            converted = pd.to_numeric(series, errors="coerce")
+            # Cheap prefilter: if a small head sample barely looks numeric,
+            # skip the full-column to_numeric scan (names, free text, ...)
+            head = series.head(32).astype(str)
+            if head.str.fullmatch(_NUMERIC_RE, na=False).mean() < 0.25:
+                return result
+
+            # Fast path: Arrow's vectorized cast converts fully-numeric string
+            # columns without pandas per-column dispatch. Mixed columns raise
+            # (Arrow has no coerce mode) and fall back to pd.to_numeric.
+            try:
+                import pyarrow as pa
+                import pyarrow.compute as pc
+
+                converted = pc.cast(pa.Array.from_pandas(series), pa.float64()).to_pandas()
+            except Exception:
+                converted = pd.to_numeric(series, errors="coerce")
             convertible_count = converted.notna().sum()
             result["convertible_ratio"] = convertible_count / len(series) if len(series) else 0.0
             if convertible_count > 0:
-                valid_converted = converted.dropna()
-                sample_size = min(3, len(valid_converted))
-                result["sample_converted"] = [
-                    convert_to_json_serializable(val) for val in valid_converted.head(sample_size).tolist()
-                ]
+                result["sample_converted"] = self._fast_sample(converted.dropna(), 3)
         except Exception:
             pass
         return result
 
     def _check_datetime_conversion(self, series: pd.Series) -> Dict[str, Any]:
         """Check if series can be converted to datetime."""
+        import pandas as pd
+
         result = {"convertible_ratio": 0.0, "sample_converted": []}
         try:
-            converted = pd.to_datetime(series, errors="coerce")
+            # Probe a small sample first: the no-format dateutil fallback is
+            # Python-per-row and is the slowest step in profiling when run
+            # blind on whole string columns.
+            sample = series.sample(200, random_state=0) if len(series) > 200 else series
+
+            best_fmt = None
+            best_ratio = 0.0
+            for fmt in _DATETIME_FORMATS:
+                ratio = pd.to_datetime(sample, format=fmt, errors="coerce").notna().mean()
+                if ratio > best_ratio:
+                    best_ratio, best_fmt = ratio, fmt
+            if best_ratio < self.datetime_threshold:
+                # No explicit format fits; let pandas infer on the sample only
+                ratio = pd.to_datetime(sample, errors="coerce").notna().mean()
+                if ratio > best_ratio:
+                    best_ratio, best_fmt = ratio, None
+            if best_ratio < self.datetime_threshold:
+                return result
+
+            # Sample looks convertible: compute the precise ratio, using the
+            # matched format (C fast path) when one was found
+            if best_fmt is not None:
+                converted = pd.to_datetime(series, format=best_fmt, errors="coerce")
+            else:
+                converted = pd.to_datetime(series, errors="coerce")
             convertible_count = converted.notna().sum()
             result["convertible_ratio"] = convertible_count / len(series) if len(series) else 0.0
             if convertible_count > 0:
@@ -329,43 +440,27 @@ class ProfilingService:
 
     def _check_boolean_conversion(self, series: pd.Series) -> Dict[str, Any]:
         """Check if series contains boolean-like values."""
+        import pandas as pd
+
         result: Dict[str, Any] = {"is_boolean": False, "unique_values": [], "sample_converted": []}
         try:
-            unique_lower = series.astype(str).str.lower().unique()
+            # Cardinality first: unique() yields at most nunique values, so
+            # high-cardinality columns bail out without lowercasing N rows
+            uniq = pd.unique(series.values)
+            if len(uniq) > 4:
+                return result
+            unique_lower = list(dict.fromkeys(str(x).lower() for x in uniq))
             unique_lower = [x for x in unique_lower if x not in ["nan", "none", ""]]
-            boolean_sets = [
-                {"true", "false"},
-                {"yes", "no"},
-                {"y", "n"},
-                {"1", "0"},
-                {"on", "off"},
-                {"enabled", "disabled"},
-                {"active", "inactive"},
-            ]
-            if len(unique_lower) <= 2:
-                for bool_set in boolean_sets:
-                    if set(unique_lower).issubset(bool_set):
-                        result.update(
-                            {
-                                "is_boolean": True,
-                                "unique_values": list(unique_lower),
-                                "sample_converted": [
-                                    True
-                                    if x in [
-                                        "true",
-                                        "yes",
-                                        "y",
-                                        "1",
-                                        "on",
-                                        "enabled",
-                                        "active",
-                                    ]
-                                    else False
-                                    for x in unique_lower
-                                ],
-                            }
-                        )
-                        break
+            # Single dict lookup per unique value instead of scanning a list
+            # of candidate pairs; the map doubles as the converter
+            if 1 <= len(unique_lower) <= 2 and all(x in self._BOOL_MAP for x in unique_lower):
+                result.update(
+                    {
+                        "is_boolean": True,
+                        "unique_values": list(unique_lower),
+                        "sample_converted": [self._BOOL_MAP[x] for x in unique_lower],
+                    }
+                )
         except Exception:
             pass
         return result
@@ -421,38 +516,3 @@ class ProfilingService:
                     print(f"Sample converted: {suggestion['sample_converted']}")
         else:
             print("\nNo type conversion suggestions found.")
-            
-            # Check for datetime conversion
-            datetime_result = self._check_datetime_conversion(non_null)
-            if datetime_result['convertible_ratio'] >= self.datetime_threshold:
-                column_info.update({
-                    'suggested_type': 'datetime',
-                    'confidence': datetime_result['convertible_ratio'],
-                    'reason': f"Can convert {datetime_result['convertible_ratio']:.1%} of values to datetime",
-                    'sample_converted': datetime_result['sample_converted']
-                })
-                return column_info
-            
-            # Check for boolean conversion
-            boolean_result = self._check_boolean_conversion(non_null)
-            if boolean_result['is_boolean']:
-                column_info.update({
-                    'suggested_type': 'boolean',
-                    'confidence': 1.0,
-                    'reason': f"Contains boolean-like values: {boolean_result['unique_values']}",
-                    'sample_converted': boolean_result['sample_converted']
-                })
-                return column_info
-        
-        # Check if should be categorical
-        if (column_info['unique_count'] <= self.categorical_threshold and 
-            column_info['unique_percentage'] < 50 and
-            str(series.dtype) in ['object', 'int64', 'float64']):
-            
-            column_info.update({
-                'suggested_type': 'categorical',
-                'confidence': 1.0 - (column_info['unique_percentage'] / 100),
-                'reason': f"Low cardinality: {column_info['unique_count']} unique values ({column_info['unique_percentage']:.1f}%)"
-            })
-        
-        return column_info
@@ -1,18 +1,188 @@
 """Session management service for Phase 2 with Jupyter kernel integration."""
 
 import asyncio
+import json
+import logging
+import logging.handlers
 import os
+import queue
+import string
+import struct
+import time
 import uuid
+import zlib
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import zmq
 from jupyter_client import KernelManager
 
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # Redis backend is optional; in-process dicts remain the default
+    aioredis = None
+
 from ..config.settings import get_settings
 from ..models.phase2_models import SessionInfo, ConversationTurn
 from ..utils.file_utils import ensure_directory_exists, file_exists
 
+logger = logging.getLogger(__name__)
+
+# Records drop into a queue and a dedicated listener thread flushes them, so
+# the request path never blocks on a stdout write
+_log_queue: "queue.SimpleQueue" = queue.SimpleQueue()
+if not logger.handlers:
+    logger.addHandler(logging.handlers.QueueHandler(_log_queue))
+    logger.setLevel(logging.INFO)
+    _log_listener = logging.handlers.QueueListener(_log_queue, logging.StreamHandler())
+    _log_listener.start()
+
+# Kernel bootstrap source, built once per process; only the dataset load
+# statement varies per session
+_INIT_TEMPLATE = string.Template("""
+import pandas as pd
+import numpy as np
+from datetime import datetime, timedelta
+import warnings
+warnings.filterwarnings('ignore')
+
+# Plotly is heavy (~50MB RSS, hundreds of ms); generated chart code imports
+# it directly, so keep it out of kernel startup and offer a lazy helper
+def _lazy_plotly():
+    import plotly.express as px
+    import plotly.graph_objects as go
+    return px, go
+
+# Load the dataset from parquet file
+import json
+$load_code
+
+# Store dataset info for reference
+dataset_info = {
+    'shape': df.shape,
+    'columns': list(df.columns),
+    'dtypes': dict(df.dtypes.astype(str)),
+    'memory_usage': df.memory_usage(deep=False).sum()  # deep=True walks every string cell
+}
+
+# One compact summary line instead of df.info()/df.head() dumps: faster init
+# and far fewer iopub messages for the parent drain loop to chew through
+print(json.dumps({'shape': list(df.shape), 'columns': list(df.columns)[:50]}))
+print("✅ Dataset is ready for analysis as 'df' variable")
+""")
+
+
+# Turns kept resident per session; older turns spill to the compressed archive
+_MAX_RESIDENT_TURNS = 20
+
+# Seconds a cached agent response stays valid for repeated queries
+_RESPONSE_CACHE_TTL = 300.0
+
+# Tables above this row count load via streamed row-group batches and are
+# never fully decoded in the server process or pinned in /dev/shm
+_LARGE_TABLE_ROWS = 1_000_000
+
+
+class ConversationBuffer:
+    """Conversation history split into a stable prefix and a volatile suffix.
+
+    Committed past turns live in ``stable`` and are never mutated again, so
+    prompt builders that serialize them produce byte-identical prefixes across
+    turns and hit provider-side prompt caches. The most recent turn sits in
+    ``volatile`` until the next turn commits it. Timestamps live in a sidecar
+    list so they never perturb the stable prefix bytes.
+
+    Residency is bounded: once ``stable`` exceeds ``_MAX_RESIDENT_TURNS``,
+    the oldest turns are appended to a zlib-framed archive file so long chat
+    sessions keep constant per-session memory and prompt-build cost.
+    """
+
+    def __init__(self, archive_path: Optional[str] = None):
+        self.stable: List[Dict[str, Any]] = []
+        self.volatile: List[Dict[str, Any]] = []
+        self.timestamps: List[str] = []
+        self.archive_path = archive_path
+
+    def add_turn(self, user_query: str, agent_response: str) -> None:
+        """Commit any in-flight turn to the stable prefix and start a new one."""
+        self.stable.extend(self.volatile)
+        self.volatile = [{"user_query": user_query, "agent_response": agent_response}]
+        self.timestamps.append(datetime.now().isoformat())
+        self._spill_old_turns()
+
+    def _spill_old_turns(self) -> None:
+        """Move turns beyond the residency cap into the compressed archive."""
+        overflow = len(self.stable) - _MAX_RESIDENT_TURNS
+        if overflow <= 0:
+            return
+        evicted = [
+            {**turn, "timestamp": ts}
+            for turn, ts in zip(self.stable[:overflow], self.timestamps[:overflow])
+        ]
+        del self.stable[:overflow]
+        del self.timestamps[:overflow]
+        if not self.archive_path:
+            return
+        try:
+            payload = zlib.compress(json.dumps(evicted).encode("utf-8"))
+            with open(self.archive_path, "ab") as f:
+                f.write(struct.pack("<I", len(payload)))
+                f.write(payload)
+        except OSError as e:
+            logger.error("❌ Failed to archive conversation turns: %s", e)
+
+    def archived_turns(self) -> List[Dict[str, Any]]:
+        """Rehydrate spilled turns from the compressed archive, oldest first."""
+        if not self.archive_path or not os.path.exists(self.archive_path):
+            return []
+        turns: List[Dict[str, Any]] = []
+        try:
+            with open(self.archive_path, "rb") as f:
+                while True:
+                    header = f.read(4)
+                    if len(header) < 4:
+                        break
+                    (length,) = struct.unpack("<I", header)
+                    turns.extend(json.loads(zlib.decompress(f.read(length))))
+        except (OSError, zlib.error, json.JSONDecodeError) as e:
+            logger.error("❌ Failed to read conversation archive: %s", e)
+        return turns
+
+    def build_messages(self, dynamic_context: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Return stable prefix + optional dynamic context + volatile suffix."""
+        messages = list(self.stable)
+        if dynamic_context is not None:
+            messages.append(dynamic_context)
+        messages.extend(self.volatile)
+        return messages
+
+    def all_turns(self) -> List[Dict[str, Any]]:
+        """Return every turn with its timestamp re-attached from the sidecar."""
+        turns = self.stable + self.volatile
+        return [{**turn, "timestamp": ts} for turn, ts in zip(turns, self.timestamps)]
+
+
+@dataclass
+class _SessionSlot:
+    """All per-session state behind a single dict lookup.
+
+    One hash probe and one attribute access per operation, instead of a
+    string-key lookup into each of half a dozen parallel dicts.
+    """
+    info: SessionInfo
+    kernel_manager: Optional[KernelManager] = None
+    history: ConversationBuffer = field(default_factory=ConversationBuffer)
+    initialized: bool = False
+    ready_event: asyncio.Event = field(default_factory=asyncio.Event)
+    last_activity: float = 0.0
+    response_cache: Dict[str, Tuple[float, str]] = field(default_factory=dict)
+    validated_history: List[ConversationTurn] = field(default_factory=list)
+
 
 class SessionManager:
     """Manages user sessions with Jupyter kernels and data persistence."""
@@ -20,13 +190,35 @@ class SessionManager:
     def __init__(self):
         """Initialize the session manager."""
         self.settings = get_settings()
-        self.sessions: Dict[str, SessionInfo] = {}
-        self.kernel_managers: Dict[str, KernelManager] = {}
-        self.conversation_histories: Dict[str, List[Dict[str, Any]]] = {}
-        self.kernel_initialized: Dict[str, bool] = {}  # Track kernel initialization status
+        self._slots: Dict[str, _SessionSlot] = {}
+        self._parquet_refcount: Dict[str, int] = {}  # Sessions sharing each parquet file
         self.temp_data_dir = "temp_data"
         ensure_directory_exists(self.temp_data_dir)
-        print(f"📁 SessionManager initialized with temp directory: {self.temp_data_dir}")
+        self.archive_dir = os.path.join(self.temp_data_dir, "archive")
+        ensure_directory_exists(self.archive_dir)
+        # Parquet footer metadata keyed by (path, mtime); sessions sharing a
+        # dataset reuse the parsed footer instead of re-reading it per kernel
+        self._pq_meta_cache: Dict[Tuple[str, float], pq.FileMetaData] = {}
+        # Arrow IPC copies of datasets published in /dev/shm; kernels sharing a
+        # dataset memory-map one decoded table instead of re-decoding parquet
+        self._shared_arrow_files: Dict[Tuple[str, float], str] = {}
+        # Pool of pre-started kernels so session creation skips the spawn cost
+        self._kernel_pool: "asyncio.Queue[KernelManager]" = asyncio.Queue(maxsize=2)
+        try:
+            asyncio.get_running_loop()
+            asyncio.create_task(self._refill_kernel_pool())
+        except RuntimeError:
+            pass  # No loop yet; the pool fills after the first create_session
+        # Optional Redis mirror: session metadata and history survive restarts
+        # and let a load balancer route follow-ups to the kernel-owning worker.
+        # Kernels themselves stay local (they cannot migrate between workers).
+        self._worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        if aioredis is not None and self.settings.redis_url:
+            self._redis = aioredis.from_url(self.settings.redis_url, decode_responses=True)
+            logger.info("🗄️ Session state mirrored to Redis: %s", self.settings.redis_url)
+        else:
+            self._redis = None
+        logger.info("📁 SessionManager initialized with temp directory: %s", self.temp_data_dir)
     
     async def create_session(self, dataset_name: str) -> str:
         """
@@ -38,42 +230,37 @@ class SessionManager:
         Returns:
             Session ID
         """
-        session_id = str(uuid.uuid4())
-        print(f"🆕 Creating new session: {session_id} for dataset: {dataset_name}")
+        session_id = uuid.uuid4().hex  # 32 chars, no dashes: smaller keys and payloads
+        logger.info("🆕 Creating new session: %s for dataset: %s", session_id, dataset_name)
         
         try:
             try:
                 base_name = os.path.splitext(os.path.basename(dataset_name))[0]
                 output_filename = f"{base_name}_filtered.parquet"
                 parquet_path = os.path.join(self.temp_data_dir, output_filename)
-                print(f"💾 Dataset detected as parquet: {parquet_path}")
+                logger.info("💾 Dataset detected as parquet: %s", parquet_path)
             except Exception as e:
-                print(f"❌ Failed to detect parquet file: {e}")
+                logger.error("❌ Failed to detect parquet file: %s", e)
                 raise
             
-            # Start Jupyter kernel with timeout
-            print(f"🚀 Starting Jupyter kernel for session: {session_id}")
+            # Acquire a Jupyter kernel (pre-warmed if the pool has one)
+            logger.info("🚀 Acquiring Jupyter kernel for session: %s", session_id)
             try:
-                import time
                 start_time = time.time()
-                kernel_manager = KernelManager()
-                kernel_manager.start_kernel()
+                try:
+                    kernel_manager = self._kernel_pool.get_nowait()
+                    logger.info("♻️ Using pre-warmed kernel from pool")
+                except asyncio.QueueEmpty:
+                    kernel_manager = await asyncio.to_thread(self._start_new_kernel)
+                asyncio.create_task(self._refill_kernel_pool())
                 kernel_start_time = time.time() - start_time
-                print(f"✅ Kernel started in {kernel_start_time:.2f}s")
+                logger.info("✅ Kernel ready in %.2fs", kernel_start_time)
                 kernel_id = kernel_manager.kernel_id
-                print(f"🔧 Kernel ID: {kernel_id}")
+                logger.info("🔧 Kernel ID: %s", kernel_id)
             except Exception as e:
-                print(f"❌ Failed to start kernel: {e}")
+                logger.error("❌ Failed to start kernel: %s", e)
                 raise
             
-            # Store kernel manager
-            self.kernel_managers[session_id] = kernel_manager
-            print(f"🔧 Kernel started with ID: {kernel_id}")
-            
-            # Initialize kernel with data loading (in background to avoid blocking)
-            print(f"🔧 Starting background kernel initialization...")
-            asyncio.create_task(self._initialize_kernel_background(session_id, parquet_path))
-            
             # Create session info
             session_info = SessionInfo(
                 session_id=session_id,
@@ -84,219 +271,499 @@ class SessionManager:
                 parquet_path=parquet_path
             )
             
-            self.sessions[session_id] = session_info
-            self.conversation_histories[session_id] = []
-            self.kernel_initialized[session_id] = False  # Mark as not initialized yet
-            print(f"✅ Session created successfully: {session_id}")
+            self._slots[session_id] = _SessionSlot(
+                info=session_info,
+                kernel_manager=kernel_manager,
+                history=ConversationBuffer(self._archive_path(session_id)),
+                last_activity=time.time()
+            )
+            self._parquet_refcount[parquet_path] = self._parquet_refcount.get(parquet_path, 0) + 1
+            
+            # Initialize kernel with data loading (in background to avoid blocking)
+            logger.info("🔧 Starting background kernel initialization...")
+            asyncio.create_task(self._initialize_kernel_background(session_id, parquet_path))
+            
+            if self._redis is not None:
+                asyncio.create_task(self._persist_session_meta(session_info))
+            logger.info("✅ Session created successfully: %s", session_id)
 
             return session_id
             
         except Exception as e:
-            print(f"❌ Failed to create session {session_id}: {e}")
+            logger.error("❌ Failed to create session %s: %s", session_id, e)
             # Cleanup on failure
             await self._cleanup_session(session_id)
             raise
     
+    async def _persist_session_meta(self, session_info: SessionInfo) -> None:
+        """Write session metadata to Redis, tagged with the kernel-owning worker."""
+        try:
+            meta = session_info.dict()
+            meta["kernel_owner"] = self._worker_id
+            await self._redis.set(f"session:{session_info.session_id}:meta", json.dumps(meta))
+        except Exception as e:
+            logger.error("❌ Failed to persist session metadata to Redis: %s", e)
+    
+    async def _persist_turn(self, session_id: str, turn_json: str) -> None:
+        """Append a conversation turn to the session's Redis history list."""
+        try:
+            key = f"session:{session_id}:history"
+            await self._redis.lpush(key, turn_json)
+            await self._redis.ltrim(key, 0, _MAX_RESIDENT_TURNS - 1)
+        except Exception as e:
+            logger.error("❌ Failed to persist conversation turn to Redis: %s", e)
+    
+    def _start_new_kernel(self) -> KernelManager:
+        """Start a fresh Jupyter kernel (blocking; run via asyncio.to_thread)."""
+        if self.settings.kernel_mode == "inprocess":
+            # Same-interpreter kernel: no fork, no re-imports, no zmq hop.
+            # No crash isolation either, so it is opt-in via KERNEL_MODE
+            from ipykernel.inprocess import InProcessKernelManager
+            kernel_manager = InProcessKernelManager()
+        else:
+            kernel_manager = KernelManager()
+        kernel_manager.start_kernel()
+        return kernel_manager
+    
+    async def _refill_kernel_pool(self) -> None:
+        """Pre-start kernels in the background until the pool is full."""
+        while not self._kernel_pool.full():
+            try:
+                kernel_manager = await asyncio.to_thread(self._start_new_kernel)
+            except Exception as e:
+                logger.error("❌ Failed to pre-warm kernel: %s", e)
+                break
+            try:
+                self._kernel_pool.put_nowait(kernel_manager)
+                logger.info("🔥 Pre-warmed kernel added to pool (%s/%s)", self._kernel_pool.qsize(), self._kernel_pool.maxsize)
+            except asyncio.QueueFull:
+                # A concurrent refill beat us to the last slot
+                kernel_manager.shutdown_kernel(now=True)
+                break
+    
     async def _initialize_kernel_background(self, session_id: str, parquet_path: str) -> None:
         """Initialize kernel in background without blocking session creation."""
         try:
-            print(f"🔧 Background: Initializing kernel for session: {session_id}")
-            await self._initialize_kernel(session_id, parquet_path)
-            self.kernel_initialized[session_id] = True  # Mark as initialized
-            print(f"✅ Background: Kernel initialization completed for session: {session_id}")
+            logger.info("🔧 Background: Initializing kernel for session: %s", session_id)
+            metadata = await self._get_parquet_metadata(parquet_path)
+            projection = await asyncio.to_thread(self._load_projection, parquet_path)
+            arrow_path = await asyncio.to_thread(self._ensure_shared_arrow, parquet_path, metadata)
+            await self._initialize_kernel(session_id, parquet_path, metadata, arrow_path, projection)
+            slot = self._slots.get(session_id)
+            if slot is not None:
+                slot.initialized = True
+                slot.ready_event.set()  # Wake up anyone awaiting wait_for_kernel_initialization
+            logger.info("✅ Background: Kernel initialization completed for session: %s", session_id)
         except Exception as e:
-            print(f"❌ Background: Kernel initialization failed for session {session_id}: {e}")
+            logger.error("❌ Background: Kernel initialization failed for session %s: %s", session_id, e)
             # Don't raise - just log the error
     
-    async def _initialize_kernel(self, session_id: str, parquet_path: str) -> None:
-        """Initialize the Jupyter kernel with data loading code."""
-        print(f"🔧 Initializing kernel for session: {session_id}")
+    async def _get_parquet_metadata(self, parquet_path: str) -> Optional[pq.FileMetaData]:
+        """Read parquet footer metadata, reusing the cached copy when the file is unchanged."""
+        try:
+            mtime = os.path.getmtime(parquet_path)
+        except OSError:
+            return None
         
-        initialization_code = f"""
-import pandas as pd
-import numpy as np
-import plotly.express as px
-import plotly.graph_objects as go
-from datetime import datetime, timedelta
-import warnings
-warnings.filterwarnings('ignore')
-
-# Load the dataset from parquet file
-print("Loading dataset from parquet file...")
-df = pd.read_parquet(r'{parquet_path}')
-print(f"Dataset loaded successfully: {{len(df)}} rows, {{len(df.columns)}} columns")
-print("Available columns:", list(df.columns))
+        cache_key = (parquet_path, mtime)
+        metadata = self._pq_meta_cache.get(cache_key)
+        if metadata is None:
+            try:
+                metadata = await asyncio.to_thread(pq.read_metadata, parquet_path)
+            except Exception as e:
+                logger.error("❌ Failed to read parquet metadata for %s: %s", parquet_path, e)
+                return None
+            self._pq_meta_cache[cache_key] = metadata
+            logger.info("📄 Parquet metadata cached: %s rows, %s columns", metadata.num_rows, metadata.num_columns)
+        return metadata
+    
+    def _load_projection(self, parquet_path: str) -> Optional[List[str]]:
+        """Read the Phase-1 projection sidecar ({base}_columns.json) if present."""
+        columns_path = parquet_path.replace("_filtered.parquet", "_columns.json")
+        if not os.path.exists(columns_path):
+            return None
+        try:
+            with open(columns_path, encoding="utf-8") as f:
+                columns = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.error("❌ Failed to read projection sidecar: %s", e)
+            return None
+        return columns if isinstance(columns, list) and columns else None
+    
+    def _ensure_shared_arrow(self, parquet_path: str,
+                             metadata: Optional[pq.FileMetaData] = None) -> Optional[str]:
+        """Decode the parquet once and publish it as an Arrow IPC file in /dev/shm.
 
-# Store dataset info for reference
-dataset_info = {{
-    'shape': df.shape,
-    'columns': list(df.columns),
-    'dtypes': dict(df.dtypes.astype(str)),
-    'memory_usage': df.memory_usage(deep=True).sum()
-}}
-
-print("\\nDataset info:")
-print(df.info())
-print("\\nFirst few rows:")
-print(df.head())
-print("\\n✅ Dataset is ready for analysis as 'df' variable")
-"""
+        Only small tables are published: decoding pins a full copy in the
+        server process and another in tmpfs, so large tables (or ones whose
+        footer we could not read) skip publication and keep the bounded
+        iter_batches load path in the kernel.
+        """
+        if metadata is None or metadata.num_rows > _LARGE_TABLE_ROWS:
+            return None
+        if not os.path.isdir("/dev/shm"):
+            return None
+        try:
+            mtime = os.path.getmtime(parquet_path)
+        except OSError:
+            return None
         
+        cache_key = (parquet_path, mtime)
+        arrow_path = self._shared_arrow_files.get(cache_key)
+        if arrow_path and os.path.exists(arrow_path):
+            return arrow_path
+        
+        base_name = os.path.splitext(os.path.basename(parquet_path))[0]
+        arrow_path = os.path.join("/dev/shm", f"{base_name}-{int(mtime)}.arrow")
+        if not os.path.exists(arrow_path):
+            try:
+                table = pq.read_table(parquet_path, memory_map=True)
+                tmp_path = f"{arrow_path}.{os.getpid()}.tmp"
+                with pa.OSFile(tmp_path, "wb") as sink:
+                    with pa.ipc.new_file(sink, table.schema) as writer:
+                        writer.write_table(table)
+                os.replace(tmp_path, arrow_path)
+                logger.info("🗃️ Shared Arrow table published: %s", arrow_path)
+            except Exception as e:
+                logger.error("❌ Failed to publish shared Arrow table: %s", e)
+                return None
+        self._shared_arrow_files[cache_key] = arrow_path
+        return arrow_path
+    
+    async def _initialize_kernel(self, session_id: str, parquet_path: str,
+                                 metadata: Optional[pq.FileMetaData] = None,
+                                 arrow_path: Optional[str] = None,
+                                 projection: Optional[List[str]] = None) -> None:
+        """Initialize the Jupyter kernel with data loading code."""
+        logger.info("🔧 Initializing kernel for session: %s", session_id)
+
+        # Only push the projection down when it actually prunes columns
+        if projection is not None and metadata is not None and len(projection) >= metadata.num_columns:
+            projection = None
+
+        # Prefer the shared Arrow IPC copy: every kernel memory-maps the same
+        # decoded table instead of re-decoding the parquet. Large datasets
+        # without a shared copy stream row groups so the kernel never holds
+        # the Arrow table and the decoded pandas frame fully materialized
+        if arrow_path is not None:
+            select = f".select({projection!r})" if projection else ""
+            load_code = (
+                "import pyarrow as pa\n"
+                f"_mm = pa.memory_map(r'{arrow_path}')\n"
+                f"df = pa.ipc.open_file(_mm).read_all(){select}.to_pandas()\n"
+                "del _mm"
+            )
+        elif metadata is not None and metadata.num_rows > _LARGE_TABLE_ROWS:
+            columns_arg = f", columns={projection!r}" if projection else ""
+            load_code = (
+                "import pyarrow.parquet as pq\n"
+                f"_pf = pq.ParquetFile(r'{parquet_path}', memory_map=True)\n"
+                "df = pd.concat([_batch.to_pandas(self_destruct=True) "
+                f"for _batch in _pf.iter_batches(batch_size=200_000{columns_arg})], copy=False)\n"
+                "del _pf"
+            )
+        else:
+            columns_arg = f", columns={projection!r}" if projection else ""
+            load_code = f"df = pd.read_parquet(r'{parquet_path}', engine='pyarrow', memory_map=True{columns_arg})"
+
+        initialization_code = _INIT_TEMPLATE.substitute(load_code=load_code)
+
         try:
-            kernel_manager = self.kernel_managers[session_id]
+            kernel_manager = self._slots[session_id].kernel_manager
             client = kernel_manager.client()
             
             # Execute initialization code
             msg_id = client.execute(initialization_code)
             
-            # Wait for execution to complete
+            # Drain kernel output in a worker thread so the blocking
+            # get_iopub_msg() calls never stall the FastAPI event loop
             timeout = 30  # 30 seconds timeout
-            start_time = asyncio.get_event_loop().time()
+            deadline = time.monotonic() + timeout
+            await asyncio.to_thread(self._drain_iopub, client, msg_id, session_id, deadline)
+                    
+        except Exception as e:
+            logger.error("❌ Failed to initialize kernel for session %s: %s", session_id, e)
+            raise
+    
+    def _drain_iopub(self, client: Any, msg_id: str, session_id: str, deadline: float) -> None:
+        """Consume iopub messages for an execution until the kernel goes idle (blocking).
+
+        Sleeps on a zmq Poller rather than waking every second, so waiting on
+        a slow dataset load costs no CPU until messages actually arrive.
+        """
+        # In-process kernels expose no zmq socket; fall back to short timed gets
+        socket = getattr(client.iopub_channel, "socket", None)
+        poller = None
+        if socket is not None:
+            poller = zmq.Poller()
+            poller.register(socket, zmq.POLLIN)
+        while True:
+            if poller is not None:
+                remaining_ms = (deadline - time.monotonic()) * 1000
+                if remaining_ms <= 0 or not poller.poll(remaining_ms):
+                    logger.warning("⏰ Kernel initialization timeout for session: %s", session_id)
+                    raise TimeoutError("Kernel initialization timed out")
+            elif time.monotonic() > deadline:
+                logger.warning("⏰ Kernel initialization timeout for session: %s", session_id)
+                raise TimeoutError("Kernel initialization timed out")
             
+            # Socket is readable: drain everything queued without blocking
             while True:
                 try:
-                    msg = client.get_iopub_msg(timeout=1)
-                    if msg['parent_header'].get('msg_id') == msg_id:
-                        if msg['msg_type'] == 'execute_result' or msg['msg_type'] == 'stream':
-                            if 'text' in msg['content']:
-                                print(f"📝 Kernel output: {msg['content']['text'].strip()}")
-                        elif msg['msg_type'] == 'status' and msg['content']['execution_state'] == 'idle':
-                            print(f"✅ Kernel initialized successfully for session: {session_id}")
-                            break
-                        elif msg['msg_type'] == 'error':
-                            error_msg = '\n'.join(msg['content']['traceback'])
-                            print(f"❌ Kernel initialization error: {error_msg}")
-                            raise RuntimeError(f"Kernel initialization failed: {error_msg}")
-                            
-                except Exception as e:
-                    if asyncio.get_event_loop().time() - start_time > timeout:
-                        print(f"⏰ Kernel initialization timeout for session: {session_id}")
-                        raise TimeoutError("Kernel initialization timed out")
+                    msg = client.get_iopub_msg(timeout=0 if poller is not None else 0.1)
+                except Exception:
+                    break
+                if msg['parent_header'].get('msg_id') != msg_id:
                     continue
-                    
-        except Exception as e:
-            print(f"❌ Failed to initialize kernel for session {session_id}: {e}")
-            raise
+                if msg['msg_type'] == 'execute_result' or msg['msg_type'] == 'stream':
+                    if 'text' in msg['content']:
+                        logger.debug("📝 Kernel output: %s", msg['content']['text'].strip())
+                elif msg['msg_type'] == 'status' and msg['content']['execution_state'] == 'idle':
+                    logger.info("✅ Kernel initialized successfully for session: %s", session_id)
+                    return
+                elif msg['msg_type'] == 'error':
+                    error_msg = '\n'.join(msg['content']['traceback'])
+                    logger.error("❌ Kernel initialization error: %s", error_msg)
+                    raise RuntimeError(f"Kernel initialization failed: {error_msg}")
     
     async def wait_for_kernel_initialization(self, session_id: str, timeout: float = 30.0) -> bool:
         """Wait for kernel initialization to complete."""
-        if session_id not in self.kernel_initialized:
+        slot = self._slots.get(session_id)
+        if slot is None:
             return False
         
-        start_time = asyncio.get_event_loop().time()
-        while not self.kernel_initialized[session_id]:
-            if asyncio.get_event_loop().time() - start_time > timeout:
-                print(f"⏰ Kernel initialization timeout for session: {session_id}")
+        if not slot.initialized:
+            try:
+                await asyncio.wait_for(slot.ready_event.wait(), timeout)
+            except asyncio.TimeoutError:
+                logger.warning("⏰ Kernel initialization timeout for session: %s", session_id)
                 return False
-            await asyncio.sleep(0.5)  # Check every 500ms
         
-        print(f"✅ Kernel ready for session: {session_id}")
+        logger.info("✅ Kernel ready for session: %s", session_id)
         return True
     
     def is_kernel_initialized(self, session_id: str) -> bool:
         """Check if kernel is initialized for a session."""
-        return self.kernel_initialized.get(session_id, False)
+        slot = self._slots.get(session_id)
+        return slot.initialized if slot else False
+    
+    @property
+    def sessions(self) -> Dict[str, SessionInfo]:
+        """Session ids mapped to their SessionInfo (view over the slots)."""
+        return {session_id: slot.info for session_id, slot in self._slots.items()}
     
     async def get_session(self, session_id: str) -> Optional[SessionInfo]:
         """Get session information."""
-        session = self.sessions.get(session_id)
-        if session:
-            # Update last activity
-            session.last_activity = datetime.now().isoformat()
-            print(f"📋 Retrieved session: {session_id}")
-        else:
-            print(f"❌ Session not found: {session_id}")
-        return session
+        slot = self._slots.get(session_id)
+        if slot is None and self._redis is not None:
+            # Metadata survives restarts in Redis; the kernel does not, so a
+            # restored session still needs its kernel re-created by the caller
+            try:
+                raw = await self._redis.get(f"session:{session_id}:meta")
+            except Exception as e:
+                logger.error("❌ Failed to read session metadata from Redis: %s", e)
+                raw = None
+            if raw:
+                meta = json.loads(raw)
+                meta.pop("kernel_owner", None)
+                slot = _SessionSlot(
+                    info=SessionInfo(**meta),
+                    history=ConversationBuffer(self._archive_path(session_id))
+                )
+                self._slots[session_id] = slot
+                logger.info("📦 Session restored from Redis: %s", session_id)
+        if slot:
+            # Update last activity (float write only; ISO is formatted on read)
+            slot.last_activity = time.time()
+            logger.debug("📋 Retrieved session: %s", session_id)
+            return slot.info
+        logger.error("❌ Session not found: %s", session_id)
+        return None
+    
+    def get_last_activity_iso(self, session_id: str) -> str:
+        """Format a session's last-activity timestamp as an ISO string."""
+        slot = self._slots.get(session_id)
+        if slot is None:
+            return ""
+        if not slot.last_activity:
+            return slot.info.last_activity
+        return datetime.fromtimestamp(slot.last_activity).isoformat()
     
     def get_kernel_manager(self, session_id: str) -> Optional[KernelManager]:
         """Get kernel manager for a session."""
-        kernel_manager = self.kernel_managers.get(session_id)
+        slot = self._slots.get(session_id)
+        kernel_manager = slot.kernel_manager if slot else None
         if kernel_manager:
-            print(f"🔧 Retrieved kernel manager for session: {session_id}")
+            logger.debug("🔧 Retrieved kernel manager for session: %s", session_id)
         else:
-            print(f"❌ Kernel manager not found for session: {session_id}")
+            logger.error("❌ Kernel manager not found for session: %s", session_id)
         return kernel_manager
     
     async def cleanup_inactive_sessions(self, max_inactive_minutes: int = 30) -> None:
         """Clean up sessions that have been inactive for too long."""
-        print(f"🧹 Starting cleanup of inactive sessions (max inactive: {max_inactive_minutes} minutes)")
+        logger.info("🧹 Starting cleanup of inactive sessions (max inactive: %s minutes)", max_inactive_minutes)
         
-        cutoff_time = datetime.now() - timedelta(minutes=max_inactive_minutes)
-        sessions_to_cleanup = []
-        
-        for session_id, session_info in self.sessions.items():
-            last_activity = datetime.fromisoformat(session_info.last_activity)
-            if last_activity < cutoff_time:
-                sessions_to_cleanup.append(session_id)
+        # Vectorized staleness scan over the float timestamps; no per-session
+        # ISO parsing or datetime allocation
+        cutoff = time.time() - max_inactive_minutes * 60
+        if self._slots:
+            session_ids = list(self._slots.keys())
+            timestamps = np.fromiter(
+                (slot.last_activity for slot in self._slots.values()),
+                dtype=np.float64, count=len(session_ids)
+            )
+            sessions_to_cleanup = [sid for sid, stale in zip(session_ids, timestamps < cutoff) if stale]
+        else:
+            sessions_to_cleanup = []
         
-        for session_id in sessions_to_cleanup:
-            print(f"🗑️ Cleaning up inactive session: {session_id}")
-            await self._cleanup_session(session_id)
+        if sessions_to_cleanup:
+            for session_id in sessions_to_cleanup:
+                logger.info("🗑️ Cleaning up inactive session: %s", session_id)
+            await asyncio.gather(
+                *(self._cleanup_session(session_id) for session_id in sessions_to_cleanup),
+                return_exceptions=True
+            )
         
         if sessions_to_cleanup:
-            print(f"✅ Cleaned up {len(sessions_to_cleanup)} inactive sessions")
+            logger.info("✅ Cleaned up %s inactive sessions", len(sessions_to_cleanup))
         else:
-            print("✅ No inactive sessions to clean up")
+            logger.info("✅ No inactive sessions to clean up")
     
     async def _cleanup_session(self, session_id: str) -> None:
         """Clean up a specific session."""
-        print(f"🗑️ Cleaning up session: {session_id}")
+        logger.info("🗑️ Cleaning up session: %s", session_id)
         
+        slot = self._slots.pop(session_id, None)
         try:
-            # Stop kernel if exists
-            if session_id in self.kernel_managers:
-                kernel_manager = self.kernel_managers[session_id]
-                if kernel_manager.is_alive():
-                    kernel_manager.shutdown_kernel(now=True)
-                del self.kernel_managers[session_id]
-                print(f"🛑 Kernel stopped for session: {session_id}")
+            # Stop kernel if exists (blocking shutdown runs off-loop)
+            if slot is not None and slot.kernel_manager is not None:
+                if slot.kernel_manager.is_alive():
+                    await asyncio.to_thread(slot.kernel_manager.shutdown_kernel, now=True)
+                logger.info("🛑 Kernel stopped for session: %s", session_id)
             
-            # Remove parquet file if exists
-            if session_id in self.sessions:
-                session_info = self.sessions[session_id]
-                if file_exists(session_info.parquet_path):
-                    os.remove(session_info.parquet_path)
-                    print(f"🗂️ Parquet file removed: {session_info.parquet_path}")
-                del self.sessions[session_id]
-
-            # Remove conversation history
-            if session_id in self.conversation_histories:
-                del self.conversation_histories[session_id]
-                print(f"💬 Conversation history removed for session: {session_id}")
+            # Remove parquet file once no other session references it
+            if slot is not None:
+                parquet_path = slot.info.parquet_path
+                remaining = self._parquet_refcount.get(parquet_path, 1) - 1
+                if remaining > 0:
+                    self._parquet_refcount[parquet_path] = remaining
+                else:
+                    self._parquet_refcount.pop(parquet_path, None)
+                    if file_exists(parquet_path):
+                        # Deletion can block on slow filesystems; keep it off-loop
+                        await asyncio.to_thread(os.remove, parquet_path)
+                        logger.info("🗂️ Parquet file removed: %s", parquet_path)
+
+            # Remove the conversation archive
+            archive_path = self._archive_path(session_id)
+            if file_exists(archive_path):
+                os.remove(archive_path)
+
+            # Drop the Redis mirror for this session
+            if self._redis is not None:
+                try:
+                    await self._redis.delete(f"session:{session_id}:meta", f"session:{session_id}:history")
+                except Exception as e:
+                    logger.error("❌ Failed to delete Redis keys for session %s: %s", session_id, e)
             
-            print(f"✅ Session cleanup completed: {session_id}")
+            logger.info("✅ Session cleanup completed: %s", session_id)
             
         except Exception as e:
-            print(f"❌ Error during session cleanup {session_id}: {e}")
+            logger.error("❌ Error during session cleanup %s: %s", session_id, e)
     
     async def shutdown_all_sessions(self) -> None:
         """Shutdown all active sessions."""
-        print("🛑 Shutting down all sessions...")
+        logger.info("🛑 Shutting down all sessions...")
         
-        session_ids = list(self.sessions.keys())
-        for session_id in session_ids:
-            await self._cleanup_session(session_id)
+        session_ids = list(self._slots.keys())
+        if session_ids:
+            # Kernel shutdowns are independent blocking I/O; fan them out so
+            # total latency is max-of-N rather than sum-of-N
+            await asyncio.gather(
+                *(self._cleanup_session(session_id) for session_id in session_ids),
+                return_exceptions=True
+            )
         
-        print(f"✅ All {len(session_ids)} sessions shut down")
+        # Remove shared Arrow copies published in /dev/shm
+        for arrow_path in self._shared_arrow_files.values():
+            if file_exists(arrow_path):
+                os.remove(arrow_path)
+        self._shared_arrow_files.clear()
+        
+        # Shut down any pre-warmed kernels still waiting in the pool
+        while not self._kernel_pool.empty():
+            kernel_manager = self._kernel_pool.get_nowait()
+            if kernel_manager.is_alive():
+                kernel_manager.shutdown_kernel(now=True)
+        
+        logger.info("✅ All %s sessions shut down", len(session_ids))
 
     def add_conversation_turn(self, session_id: str, user_query: str, agent_response: str) -> None:
         """Add a conversation turn to the session history."""
-        if session_id not in self.conversation_histories:
-            self.conversation_histories[session_id] = []
+        slot = self._slots.get(session_id)
+        if slot is None:
+            logger.error("❌ Cannot record conversation turn for unknown session: %s", session_id)
+            return
+
+        slot.history.add_turn(user_query, agent_response)
+        slot.response_cache[self._normalize_query(user_query)] = (time.time(), agent_response)
+        if self._redis is not None:
+            turn_json = json.dumps({
+                "user_query": user_query,
+                "agent_response": agent_response,
+                "timestamp": datetime.now().isoformat()
+            })
+            try:
+                asyncio.create_task(self._persist_turn(session_id, turn_json))
+            except RuntimeError:
+                pass  # No running loop (e.g. sync test context); skip the mirror
+        logger.debug("💬 Added conversation turn to session %s", session_id)
 
-        from datetime import datetime
-        turn = {
-            "user_query": user_query,
-            "agent_response": agent_response,
-            "timestamp": datetime.now().isoformat()
-        }
+    @staticmethod
+    def _normalize_query(query: str) -> str:
+        """Canonical cache key for a query (case- and whitespace-insensitive)."""
+        return " ".join(query.lower().split())
+
+    def get_cached_response(self, session_id: str, user_query: str) -> Optional[str]:
+        """Return a recent agent response for a repeated query, if still fresh."""
+        slot = self._slots.get(session_id)
+        entry = slot.response_cache.get(self._normalize_query(user_query)) if slot else None
+        if entry is None:
+            return None
+        cached_at, response = entry
+        if time.time() - cached_at > _RESPONSE_CACHE_TTL:
+            return None
+        logger.debug("♻️ Response cache hit for session %s", session_id)
+        return response
+
+    def get_validated_history(self, session_id: str, turns: List[dict]) -> List[ConversationTurn]:
+        """Validated ConversationTurn models for turns, reusing the cached prefix.
+
+        History is append-only, so prior turns keep their validated models
+        and only the new suffix pays for Pydantic validation each query.
+        """
+        slot = self._slots.get(session_id)
+        if slot is None:
+            return [ConversationTurn(**t) for t in turns]
+        cached = slot.validated_history
+        if len(cached) > len(turns):  # History was replaced, not extended
+            cached = []
+        validated = cached + [ConversationTurn(**t) for t in turns[len(cached):]]
+        slot.validated_history = validated
+        return validated
 
-        self.conversation_histories[session_id].append(turn)
-        print(f"💬 Added conversation turn to session {session_id}")
+    def _archive_path(self, session_id: str) -> str:
+        """Path of the compressed archive for a session's evicted turns."""
+        return os.path.join(self.archive_dir, f"{session_id}.zarc")
 
-    def get_conversation_history(self, session_id: str) -> List[Dict[str, Any]]:
-        """Get conversation history for a session."""
-        return self.conversation_histories.get(session_id, [])
+    def get_conversation_history(self, session_id: str, include_archived: bool = False) -> List[Dict[str, Any]]:
+        """Get conversation history for a session (resident turns by default)."""
+        slot = self._slots.get(session_id)
+        if slot is None:
+            return []
+        if include_archived:
+            return slot.history.archived_turns() + slot.history.all_turns()
+        return slot.history.all_turns()
 
 
 # Global session manager instance (lazy)
@@ -307,6 +774,6 @@ def get_session_manager() -> SessionManager:
     """Get the global session manager instance with lazy initialization."""
     global _session_manager
     if _session_manager is None:
-        print("🔄 Initializing SessionManager (lazy)...")
+        logger.info("🔄 Initializing SessionManager (lazy)...")
         _session_manager = SessionManager()
     return _session_manager
@@ -1,41 +1,215 @@
 """WebSocket streaming service for real-time agent communication."""
 
 import asyncio
-import json
+import logging
+import re
+import time
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Dict, KeysView, List, Optional
+
+import orjson
 
 from fastapi import WebSocket, WebSocketDisconnect
 
-from ..models.phase2_models import MessageType, StreamMessage
+try:
+    from starlette.websockets import WebSocketState
+    _WS_CONNECTED = WebSocketState.CONNECTED
+except Exception:  # State enum unavailable: skip the pre-send check
+    _WS_CONNECTED = None
+
+logger = logging.getLogger(__name__)
+
+try:
+    import msgpack
+except ImportError:  # Binary framing is optional; JSON remains the default
+    msgpack = None
+
+from ..models.phase2_models import MessageType
 
 # Add conditional imports to avoid circular imports
 try:
     from ..models.phase2_models import AgentState, ConversationTurn
     IMPORTS_AVAILABLE = True
-    print("🔄 WebSocket service: Multi-agent imports successful")
+    logger.debug("🔄 WebSocket service: Multi-agent imports successful")
 except Exception as e:
-    print(f"❌ WebSocket service: Import error: {e}")
+    logger.error("❌ WebSocket service: Import error: %s", e)
     IMPORTS_AVAILABLE = False
 
 # Defer multi_agent_service import to avoid circular imports
 _multi_agent_service = None
 _service_init_lock = asyncio.Lock()
 
+# Deferred-circular service singletons, resolved once instead of re-running
+# the import machinery inside every query
+_jupyter_service = None
+_session_manager = None
+_file_storage = None
+
+
+def _get_deps():
+    """Resolve the circularly-imported service singletons once."""
+    global _jupyter_service, _session_manager, _file_storage
+    if _session_manager is None:
+        from ..services.jupyter_service import get_jupyter_service
+        from ..services.session_service import get_session_manager
+        from ..services.file_storage_service import get_file_storage_service
+        _jupyter_service = get_jupyter_service()
+        _session_manager = get_session_manager()
+        _file_storage = get_file_storage_service()
+    return _jupyter_service, _session_manager, _file_storage
+
+# ISO timestamp memoized per-millisecond: messages sent in the same bucket
+# reuse the formatted string instead of allocating a datetime every send
+_now_bucket: int = 0
+_now_iso: str = ""
+
+
+# Payloads above this size serialize off-loop so encoding a big table or
+# chart HTML frame cannot stall every other session
+_OFFLOAD_SERIALIZE_BYTES = 64 * 1024
+
+# One case-insensitive pass over the query instead of nine substring scans
+# of a lowercased copy
+_CHART_RE = re.compile(
+    r"\b(chart|plot|graph|visualiz\w*|bar|line|pie|scatter|histogram)\b",
+    re.IGNORECASE,
+)
+
+
+def _payload_size_hint(payload) -> int:
+    """Cheap size estimate for deciding whether to serialize off-loop."""
+    if isinstance(payload, (str, bytes)):
+        return len(payload)
+    if isinstance(payload, dict):
+        return sum(len(v) for v in payload.values() if isinstance(v, (str, bytes)))
+    return 0
+
+
+def _quantize_number(value):
+    """Collapse integral floats to ints and cap the rest at 6 significant digits."""
+    if type(value) is float:
+        if value.is_integer():
+            return int(value)
+        return float(f"{value:.6g}")
+    return value
+
+
+def _quantize_chart_payload(chart_data: dict) -> dict:
+    """Shrink plotly_json trace arrays before they hit the wire.
+
+    Traces come out of pandas as full-precision float64 lists, but a chart
+    point can only land on one of a few thousand pixels, so digits past
+    the sixth are invisible to the client. Rounding them away cuts the
+    encoded size of dense traces without touching how the chart renders.
+    """
+    if chart_data.get("type") != "plotly_json":
+        return chart_data
+    figure = chart_data.get("data")
+    traces = figure.get("data") if isinstance(figure, dict) else None
+    if not isinstance(traces, list):
+        return chart_data
+    for trace in traces:
+        if not isinstance(trace, dict):
+            continue
+        for key, values in trace.items():
+            if isinstance(values, list):
+                trace[key] = [_quantize_number(v) for v in values]
+    return chart_data
+
+
+def _fast_now_iso() -> str:
+    """Current time as an ISO string, cached at ~1ms granularity."""
+    global _now_bucket, _now_iso
+    ns = time.time_ns()
+    bucket = ns // 1_000_000
+    if bucket != _now_bucket:
+        _now_bucket = bucket
+        # Format the bucket's own instant so the string matches the key
+        _now_iso = datetime.fromtimestamp(ns / 1e9).isoformat()
+    return _now_iso
+
 
 class WebSocketManager:
     """Manages WebSocket connections for real-time streaming."""
+
+    __slots__ = (
+        "active_connections",
+        "_pending",
+        "_flush_tasks",
+        "_binary",
+        "_send_queues",
+        "_senders",
+        "_subscriptions",
+        "_flush_locks",
+    )
     
+    # Message types that flush the pending batch immediately instead of
+    # waiting out the coalescing window
+    _FLUSH_NOW_TYPES = frozenset({
+        MessageType.FINAL_RESPONSE,
+        MessageType.EXECUTION_SUCCESS,
+        MessageType.EXECUTION_ERROR,
+        MessageType.ERROR,
+        MessageType.CHART,
+        MessageType.CHART_BEGIN,
+        MessageType.CHART_CHUNK,
+        MessageType.CHART_END,
+    })
+
+    # Seconds small messages wait so several can share one WebSocket frame
+    _BATCH_WINDOW = 0.005
+
+    # Flush regardless of window once a batch reaches this many messages,
+    # bounding both frame size and worst-case queueing delay
+    _MAX_BATCH = 64
+
+    # Enum .value goes through a descriptor on every access; resolve each
+    # member's wire string once at class-definition time
+    _TYPE_VALUES = {mt: mt.value for mt in MessageType}
+
+    # One bit per MessageType for the per-session subscription mask
+    _TYPE_BITS = {mt: 1 << i for i, mt in enumerate(MessageType)}
+    _NAME_BITS = {mt.value: 1 << i for i, mt in enumerate(MessageType)}
+    _ALL_MASK = (1 << len(MessageType)) - 1
+
     def __init__(self):
         """Initialize the WebSocket manager."""
         self.active_connections: Dict[str, WebSocket] = {}
-        print("🔌 WebSocketManager initialized")
+        self._pending: Dict[str, List[dict]] = {}
+        self._flush_tasks: Dict[str, asyncio.Task] = {}
+        self._binary: Dict[str, bool] = {}  # Sessions negotiated to msgpack frames
+        self._send_queues: Dict[str, asyncio.Queue] = {}
+        self._senders: Dict[str, asyncio.Task] = {}
+        self._subscriptions: Dict[str, int] = {}
+        self._flush_locks: Dict[str, asyncio.Lock] = {}
+        logger.debug("🔌 WebSocketManager initialized")
     
     async def connect(self, websocket: WebSocket, session_id: str) -> None:
         """Accept a WebSocket connection and store it."""
         await websocket.accept()
         self.active_connections[session_id] = websocket
-        print(f"🔗 WebSocket connected for session: {session_id}")
+        # Clients opt into binary msgpack frames via ?format=msgpack; legacy
+        # JSON text frames stay the default
+        self._binary[session_id] = (
+            msgpack is not None and websocket.query_params.get("format") == "msgpack"
+        )
+        # Clients can subscribe to a subset of message types via
+        # ?subscribe=thought,code,... — e.g. production frontends that skip
+        # raw LOG frames save hundreds of sends per query. Default is all.
+        subscribe = websocket.query_params.get("subscribe")
+        if subscribe:
+            mask = 0
+            for name in subscribe.split(","):
+                mask |= self._NAME_BITS.get(name.strip(), 0)
+            self._subscriptions[session_id] = mask or self._ALL_MASK
+        else:
+            self._subscriptions[session_id] = self._ALL_MASK
+        # Dedicated sender task per session: the agent loop enqueues and moves
+        # on, while slow clients apply backpressure through the bounded queue
+        self._send_queues[session_id] = asyncio.Queue(maxsize=256)
+        self._flush_locks[session_id] = asyncio.Lock()
+        self._senders[session_id] = asyncio.create_task(self._sender_loop(session_id))
+        logger.info("🔗 WebSocket connected for session: %s", session_id)
         
         # Send welcome message
         await self.send_message(session_id, MessageType.LOG, "WebSocket connection established")
@@ -44,7 +218,24 @@ class WebSocketManager:
         """Remove a WebSocket connection."""
         if session_id in self.active_connections:
             del self.active_connections[session_id]
-            print(f"🔌 WebSocket disconnected for session: {session_id}")
+            logger.info("🔌 WebSocket disconnected for session: %s", session_id)
+        task = self._flush_tasks.pop(session_id, None)
+        if task is not None:
+            task.cancel()
+        sender = self._senders.pop(session_id, None)
+        if sender is not None and sender is not asyncio.current_task():
+            sender.cancel()
+        send_queue = self._send_queues.pop(session_id, None)
+        if send_queue is not None:
+            # Drain the orphaned queue so a flush blocked in put() on a full
+            # queue wakes up and returns instead of hanging the agent task —
+            # with the sender cancelled nothing else would ever free a slot
+            while not send_queue.empty():
+                send_queue.get_nowait()
+        self._pending.pop(session_id, None)
+        self._binary.pop(session_id, None)
+        self._subscriptions.pop(session_id, None)
+        self._flush_locks.pop(session_id, None)
     
     async def send_message(
         self, 
@@ -55,47 +246,152 @@ class WebSocketManager:
     ) -> None:
         """Send a message to a specific session."""
         if session_id not in self.active_connections:
-            print(f"⚠️ No WebSocket connection found for session: {session_id}")
+            logger.warning("⚠️ No WebSocket connection found for session: %s", session_id)
+            return
+        
+        # Unsubscribed types never serialize or hit the wire
+        if not self._subscriptions.get(session_id, self._ALL_MASK) & self._TYPE_BITS[message_type]:
             return
         
+        # Build the wire dict directly — the message shapes are fixed, so a
+        # Pydantic model walk per send is pure overhead
+        pending = self._pending.setdefault(session_id, [])
+        pending.append({
+            "type": self._TYPE_VALUES[message_type],
+            "payload": payload,
+            "timestamp": _fast_now_iso(),
+            "step_index": step_index,
+        })
+
+        if (
+            message_type in self._FLUSH_NOW_TYPES
+            or len(pending) >= self._MAX_BATCH
+        ):
+            await self.flush(session_id)
+        elif session_id not in self._flush_tasks:
+            self._flush_tasks[session_id] = asyncio.create_task(
+                self._flush_after(session_id, self._BATCH_WINDOW)
+            )
+    
+    async def _flush_after(self, session_id: str, delay: float) -> None:
+        """Flush the session's pending batch after the coalescing window."""
         try:
-            message = StreamMessage(
-                type=message_type,
-                payload=payload,
-                timestamp=datetime.now().isoformat(),
-                step_index=step_index
+            await asyncio.sleep(delay)
+            await self.flush(session_id)
+        except asyncio.CancelledError:
+            pass
+    
+    async def flush(self, session_id: str) -> None:
+        """Send all pending messages for a session as a single frame."""
+        task = self._flush_tasks.pop(session_id, None)
+        if task is not None and task is not asyncio.current_task():
+            task.cancel()
+        
+        messages = self._pending.pop(session_id, None)
+        if not messages:
+            return
+        
+        websocket = self.active_connections.get(session_id)
+        if websocket is None:
+            return
+        
+        try:
+            # Pre-check websocket state if available (Starlette)
+            if (
+                _WS_CONNECTED is not None
+                and getattr(websocket, "client_state", _WS_CONNECTED) != _WS_CONNECTED
+            ):
+                logger.warning("⚠️ WebSocket for session %s not connected. Skipping send.", session_id)
+                self.disconnect(session_id)
+                return
+
+            # Single messages keep the original wire shape; bursts ride one frame
+            frame = messages[0] if len(messages) == 1 else {"batch": messages}
+            offload = any(
+                _payload_size_hint(m.get("payload")) > _OFFLOAD_SERIALIZE_BYTES
+                for m in messages
             )
 
-            websocket = self.active_connections[session_id]
+            # Encode and enqueue under a per-session lock: an offloaded encode
+            # suspends here, and an immediate-flush message raced past it
+            # would otherwise reach the queue first and reorder the stream.
+            # Batches are popped synchronously above, so lock acquisition
+            # order matches stream order (asyncio.Lock is FIFO).
+            async with self._flush_locks.setdefault(session_id, asyncio.Lock()):
+                if self._binary.get(session_id):
+                    if offload:
+                        data = await asyncio.to_thread(msgpack.packb, frame, default=str)
+                    else:
+                        data = msgpack.packb(frame, default=str)
+                else:
+                    if offload:
+                        encoded = await asyncio.to_thread(orjson.dumps, frame, default=str)
+                    else:
+                        encoded = orjson.dumps(frame, default=str)
+                    data = encoded.decode()
 
-            # Pre-check websocket state if available (Starlette)
-            try:
-                from starlette.websockets import WebSocketState
-                ws_state = getattr(websocket, "client_state", None)
-                if ws_state is not None and ws_state != WebSocketState.CONNECTED:
-                    print(f"⚠️ WebSocket for session {session_id} not connected (state={ws_state}). Skipping send.")
-                    self.disconnect(session_id)
+                send_queue = self._send_queues.get(session_id)
+                if send_queue is None:
                     return
-            except Exception:
-                # If state enum not available, continue best-effort
-                pass
-
-            # Avoid indefinite await hangs: send with timeout and rich error logs
-            try:
-                await asyncio.wait_for(
-                    websocket.send_text(message.model_dump_json()),
-                    timeout=5.0
-                )
-            except asyncio.TimeoutError:
-                print(f"⏱️ send_text timeout for session {session_id} while sending {message_type.value}")
+                try:
+                    send_queue.put_nowait(data)
+                except asyncio.QueueFull:
+                    # Slow client: shed pure-log batches, apply backpressure otherwise
+                    if all(m["type"] == MessageType.LOG.value for m in messages):
+                        logger.warning("⚠️ Send queue full for session %s; dropping %d log message(s)", session_id, len(messages))
+                        return
+                    await send_queue.put(data)
+
+            logger.debug("📤 Queued %d message(s) for session %s", len(messages), session_id)
+
+        except Exception:
+            logger.exception("❌ Error sending message to session %s", session_id)
+            # Remove broken connection
+            self.disconnect(session_id)
+    
+    async def _sender_loop(self, session_id: str) -> None:
+        """Single consumer draining a session's send queue to the socket."""
+        send_queue = self._send_queues[session_id]
+        while True:
+            data = await send_queue.get()
+            websocket = self.active_connections.get(session_id)
+            if websocket is None:
                 return
+            try:
+                # A plain task + call_later timer is cheaper than wait_for,
+                # which allocates a wrapper Future per call on a path that
+                # almost never times out
+                if isinstance(data, bytes):
+                    send_task = asyncio.ensure_future(websocket.send_bytes(data))
+                else:
+                    send_task = asyncio.ensure_future(websocket.send_text(data))
 
-            print(f"📤 Sent {message_type.value} message to session {session_id}: {str(payload)[:100]}...")
+                timed_out = False
 
-        except Exception as e:
-            print(f"❌ Error sending message to session {session_id}: {e}")
-            # Remove broken connection
-            self.disconnect(session_id)
+                def _expire():
+                    nonlocal timed_out
+                    timed_out = True
+                    send_task.cancel()
+
+                timer = asyncio.get_running_loop().call_later(5.0, _expire)
+                try:
+                    await send_task
+                finally:
+                    timer.cancel()
+            except asyncio.CancelledError:
+                # Only the deadline timer means a slow client; disconnect()
+                # and shutdown also cancel us and must propagate as a real
+                # cancellation, not be swallowed as a fake timeout
+                if not timed_out:
+                    send_task.cancel()
+                    raise
+                logger.warning("⏱️ Send timeout for session %s; dropping connection", session_id)
+                self.disconnect(session_id)
+                return
+            except Exception:
+                logger.exception("❌ Error sending message to session %s", session_id)
+                self.disconnect(session_id)
+                return
     
     async def send_thought(self, session_id: str, thought: str, step_index: Optional[int] = None) -> None:
         """Send an agent thought message."""
@@ -145,9 +441,42 @@ class WebSocketManager:
         await self.send_message(session_id, MessageType.TABLE, table_data, step_index)
     
     async def send_chart(self, session_id: str, chart_data: dict, step_index: Optional[int] = None) -> None:
-        """Send chart data."""
+        """Send chart data, quantizing plotly_json traces down to wire precision."""
+        if isinstance(chart_data, dict):
+            chart_data = _quantize_chart_payload(chart_data)
         await self.send_message(session_id, MessageType.CHART, chart_data, step_index)
     
+    async def send_chart_streaming(
+        self,
+        session_id: str,
+        chart_html: str,
+        metadata: Optional[dict] = None,
+        chunk_size: int = 32768,
+    ) -> None:
+        """Stream chart HTML as CHART_BEGIN / CHART_CHUNK / CHART_END frames.
+
+        Large Plotly documents sent as one frame serialize, encrypt and
+        transmit as a single block that delays every message queued behind
+        them; 32KB chunks let the client render progressively and keep log
+        frames interleaved.
+        """
+        total_chunks = (len(chart_html) + chunk_size - 1) // chunk_size
+        begin_payload = {
+            "total_bytes": len(chart_html),
+            "chunk_size": chunk_size,
+            "total_chunks": total_chunks,
+        }
+        if metadata:
+            begin_payload.update(metadata)
+        await self.send_message(session_id, MessageType.CHART_BEGIN, begin_payload)
+        for seq, start in enumerate(range(0, len(chart_html), chunk_size)):
+            await self.send_message(
+                session_id,
+                MessageType.CHART_CHUNK,
+                {"seq": seq, "data": chart_html[start:start + chunk_size]},
+            )
+        await self.send_message(session_id, MessageType.CHART_END, {"total_chunks": total_chunks})
+    
     async def send_plan(self, session_id: str, plan: List[str]) -> None:
         """Send the execution plan."""
         await self.send_message(session_id, MessageType.PLAN, plan)
@@ -160,18 +489,25 @@ class WebSocketManager:
         """Get the number of active connections."""
         return len(self.active_connections)
     
-    def get_active_sessions(self) -> List[str]:
-        """Get list of active session IDs."""
-        return list(self.active_connections.keys())
+    def get_active_sessions(self) -> KeysView[str]:
+        """Get the active session IDs as a live view (no list copy).
+
+        The connections dict is insertion-ordered, so iterating the view
+        walks sessions in connect order; membership tests stay O(1) instead
+        of scanning a copied list.
+        """
+        return self.active_connections.keys()
 
 
 class StreamingMultiAgentService:
     """Multi-agent service with WebSocket streaming capabilities."""
 
+    __slots__ = ("websocket_manager",)
+
     def __init__(self, websocket_manager: WebSocketManager):
         """Initialize with WebSocket manager."""
         self.websocket_manager = websocket_manager
-        print("📡 StreamingMultiAgentService initialized")
+        logger.debug("📡 StreamingMultiAgentService initialized")
 
     async def process_query_with_streaming(
         self,
@@ -181,127 +517,120 @@ class StreamingMultiAgentService:
         conversation_history: List = None
     ) -> None:
         """Process a query with real-time streaming of the agent workflow."""
-        print(f"🚀 Starting streaming query processing for session: {session_id}")
-        print(f"❓ Query: {user_query}")
-        print(f"📊 Dataset metadata keys: {list(dataset_metadata.keys()) if dataset_metadata else 'None'}")
-        print(f"🔍 WebSocket manager exists: {self.websocket_manager is not None}")
-        print(f"📍 Entering try block...")
+        logger.info("🚀 Starting streaming query processing for session: %s", session_id)
+        logger.debug("❓ Query: %s", user_query)
+        logger.debug("📊 Dataset metadata keys: %s", list(dataset_metadata.keys()) if dataset_metadata else None)
 
         try:
-            print(f"📍 Inside try block")
             # Check if OpenAI API key is available
             import os
-            print(f"📍 Imported os module")
             api_key = os.getenv("OPENAI_API_KEY")
-            print(f"📍 API key exists: {bool(api_key)}, length: {len(api_key) if api_key else 0}")
+            logger.debug("📍 API key exists: %s", bool(api_key))
             if not api_key:
                 error_msg = "OpenAI API key not found. Please set OPENAI_API_KEY in your .env file."
-                print(f"❌ {error_msg}")
+                logger.error("❌ %s", error_msg)
                 await self.websocket_manager.send_error(session_id, error_msg)
                 return
 
-            print(f"📍 Imports already available, no need to import again")
-
             # Send initial log
-            print(f"📍 About to send initial log message...")
             await self.websocket_manager.send_log(session_id, f"Processing query: {user_query}")
-            print(f"📤 Sent initial log message")
+            logger.debug("📤 Sent initial log message")
+
+            # Repeated question? Serve the cached response and skip the LLM + kernel round-trip
+            _, session_manager, _ = _get_deps()
+            cached_response = session_manager.get_cached_response(session_id, user_query)
+            if cached_response is not None:
+                await self.websocket_manager.send_log(session_id, "♻️ Found a recent answer for this question")
+                await self.websocket_manager.send_final_response(session_id, cached_response)
+                return
 
-            # Create agent state
+            # Create agent state; prior turns reuse their validated models
             state = AgentState(
                 session_id=session_id,
                 user_query=user_query,
                 dataset_metadata=dataset_metadata,
-                conversation_history=[
-                    ConversationTurn(**turn) for turn in (conversation_history or [])
-                ]
+                conversation_history=session_manager.get_validated_history(
+                    session_id, conversation_history or []
+                )
             )
 
-            # Wait for kernel initialization
-            print(f"📊 Waiting for kernel initialization for session: {session_id}")
+            # Kernel startup and multi-agent service init are independent;
+            # on a cold session running them together saves up to the full
+            # kernel wait
+            logger.debug("📊 Waiting for kernel initialization for session: %s", session_id)
             await self.websocket_manager.send_log(session_id, "⚙️ Preparing analysis environment...")
             
-            from ..services.session_service import get_session_manager
-            session_manager = get_session_manager()
-            kernel_ready = await session_manager.wait_for_kernel_initialization(session_id, timeout=30.0)
+            kernel_ready, service_result = await asyncio.gather(
+                session_manager.wait_for_kernel_initialization(session_id, timeout=30.0),
+                self._ensure_service_initialized(session_id),
+                return_exceptions=True,
+            )
             
-            if kernel_ready:
+            if kernel_ready is True:
                 await self.websocket_manager.send_log(session_id, "✅ Analysis environment ready!")
-                print(f"✅ Kernel ready for session: {session_id}")
+                logger.info("✅ Kernel ready for session: %s", session_id)
             else:
                 await self.websocket_manager.send_error(session_id, "Kernel initialization timed out. Please try again.")
-                print(f"❌ Kernel initialization timeout for session: {session_id}")
+                logger.error("❌ Kernel initialization timeout for session: %s", session_id)
                 return
 
-            # Get multi-agent service - initialize once and reuse with proper locking
-            print(f"🤖 Getting multi-agent service...")
-            global _multi_agent_service
-            
-            try:
-                # Use async lock to prevent concurrent initialization
-                async with _service_init_lock:
-                    if _multi_agent_service is None:
-                        print(f"🔄 Multi-agent service not pre-initialized, initializing now...")
-                        await self.websocket_manager.send_log(session_id, "⚙️ Initializing analysis engine (first time may take longer)...")
-                        
-                        def init_service():
-                            print(f"🔄 Inside init_service thread...")
-                            from ..services.multi_agent_service import get_multi_agent_service
-                            print(f"🔄 Imported get_multi_agent_service")
-                            service = get_multi_agent_service()
-                            print(f"🔄 Service obtained from get_multi_agent_service")
-                            return service
-                        
-                        loop = asyncio.get_event_loop()
-                        print(f"🔄 Running service initialization...")
-                        _multi_agent_service = await asyncio.wait_for(
-                            loop.run_in_executor(None, init_service),
-                            timeout=60.0  # Increased timeout for runtime initialization
-                        )
-                        
-                        print(f"✅ Multi-agent service initialized successfully")
-                        await self.websocket_manager.send_log(session_id, "✅ Analysis engine initialized successfully!")
-                    else:
-                        print(f"♻️ Using pre-initialized multi-agent service")
-                
-                multi_agent_service = _multi_agent_service
-                print(f"✅ Multi-agent service obtained")
-            except asyncio.TimeoutError:
-                print(f"❌ Multi-agent service initialization timed out after 60 seconds")
+            if isinstance(service_result, asyncio.TimeoutError):
+                logger.error("❌ Multi-agent service initialization timed out after 60 seconds")
                 await self.websocket_manager.send_error(session_id, "Service initialization timed out. Please restart the server or try again.")
                 return
-            except Exception as e:
-                print(f"❌ Failed to get multi-agent service: {e}")
-                import traceback
-                traceback.print_exc()
-                await self.websocket_manager.send_error(session_id, f"Service initialization failed: {str(e)}")
+            if isinstance(service_result, BaseException):
+                logger.error("❌ Failed to get multi-agent service: %s", service_result)
+                await self.websocket_manager.send_error(session_id, f"Service initialization failed: {str(service_result)}")
                 return
+            
+            multi_agent_service = service_result
+            logger.debug("✅ Multi-agent service obtained")
 
             # Process with streaming updates
-            print(f"🔄 Starting streaming workflow...")
+            logger.debug("🔄 Starting streaming workflow...")
             try:
                 await self._process_with_streaming(multi_agent_service, state)
-                print(f"✅ Streaming workflow completed")
+                logger.info("✅ Streaming workflow completed")
             except Exception as e:
-                print(f"❌ Streaming workflow error: {e}")
-                import traceback
-                traceback.print_exc()
+                logger.exception("❌ Streaming workflow error")
                 await self.websocket_manager.send_error(session_id, f"Workflow error: {str(e)}")
 
         except Exception as e:
-            print(f"❌ Streaming query processing error: {e}")
+            logger.exception("❌ Streaming query processing error")
             await self.websocket_manager.send_error(session_id, f"Processing error: {str(e)}")
 
+    async def _ensure_service_initialized(self, session_id: str):
+        """Return the shared multi-agent service, initializing it once."""
+        global _multi_agent_service
+        # Use async lock to prevent concurrent initialization
+        async with _service_init_lock:
+            if _multi_agent_service is None:
+                logger.info("🔄 Multi-agent service not pre-initialized, initializing now...")
+                await self.websocket_manager.send_log(session_id, "⚙️ Initializing analysis engine (first time may take longer)...")
+
+                def init_service():
+                    from ..services.multi_agent_service import get_multi_agent_service
+                    return get_multi_agent_service()
+
+                logger.debug("🔄 Running service initialization...")
+                _multi_agent_service = await asyncio.wait_for(
+                    asyncio.to_thread(init_service),
+                    timeout=60.0  # Increased timeout for runtime initialization
+                )
+
+                logger.info("✅ Multi-agent service initialized successfully")
+                await self.websocket_manager.send_log(session_id, "✅ Analysis engine initialized successfully!")
+            else:
+                logger.debug("♻️ Using pre-initialized multi-agent service")
+        return _multi_agent_service
+
     async def _process_with_streaming(self, multi_agent_service, state) -> None:
         """Process the multi-agent workflow with streaming updates."""
-        print(f"🔄 Entering _process_with_streaming method...")
         session_id = state.session_id
-        print(f"📋 Session ID: {session_id}")
+        logger.debug("🔄 Entering _process_with_streaming for session: %s", session_id)
 
         try:
-            print(f"🤖 Using provided multi-agent service...")
             await self.websocket_manager.send_log(session_id, "⚙️ Initializing analysis engine...")
-            print(f"📤 Sent initialization message")
 
             # Step 1: Planning
             await self.websocket_manager.send_log(session_id, "🎯 Starting planning phase...")
@@ -330,7 +659,7 @@ class StreamingMultiAgentService:
                         timeout=50.0  # 50 second timeout at service level
                     )
                 except asyncio.TimeoutError:
-                    print(f"❌ Code generation timed out for step {step_index + 1}")
+                    logger.error("❌ Code generation timed out for step %d", step_index + 1)
                     await self.websocket_manager.send_error(
                         session_id,
                         f"Code generation timed out for step {step_index + 1}. Please try again with a simpler query.",
@@ -339,16 +668,22 @@ class StreamingMultiAgentService:
                     break  # Exit the loop
 
                 if hasattr(state, 'current_thought'):
-                    print("trying to send thought")
                     await self.websocket_manager.send_thought(session_id, state.current_thought, step_index)
 
                 if hasattr(state, 'current_code'):
-                    print("trying to send code")
                     await self.websocket_manager.send_code(session_id, state.current_code, step_index)
 
-                # Code execution
-                await self.websocket_manager.send_execution_start(session_id, step_index)
-                state = await multi_agent_service._code_executor(state)
+                # Code execution. The start notification and the kernel
+                # round-trip are independent, so they run concurrently.
+                # Code generation for step N+1 is NOT overlapped with step N's
+                # execution: its prompt consumes the execution output
+                # (history tail, available variables, execution context), so
+                # speculating would feed the model stale state or waste a
+                # discarded LLM call per step.
+                _, state = await asyncio.gather(
+                    self.websocket_manager.send_execution_start(session_id, step_index),
+                    multi_agent_service._code_executor(state),
+                )
 
                 if hasattr(state, 'last_execution_result'):
                     if state.last_execution_result.success:
@@ -392,8 +727,7 @@ class StreamingMultiAgentService:
                             break
 
             # Step 3: Chart generation (if requested)
-            chart_keywords = ["chart", "plot", "graph", "visualiz", "bar", "line", "pie", "scatter", "histogram"]
-            needs_chart = any(keyword in state.user_query.lower() for keyword in chart_keywords)
+            needs_chart = _CHART_RE.search(state.user_query) is not None
 
             if needs_chart:
                 await self.websocket_manager.send_log(session_id, "📊 Generating visualization...")
@@ -403,82 +737,99 @@ class StreamingMultiAgentService:
                         timeout=35.0  # 35 second timeout for chart generation
                     )
                 except asyncio.TimeoutError:
-                    print("❌ Chart generation timed out")
+                    logger.error("❌ Chart generation timed out")
                     await self.websocket_manager.send_error(session_id, "Chart generation timed out. The analysis is complete but visualization could not be generated.")
                     state.chart_code = None
             else:
                 await self.websocket_manager.send_log(session_id, "📊 No visualization requested, skipping chart generation...")
                 state.chart_code = None
 
+            chart_task = None
             if state.chart_code:
                 await self.websocket_manager.send_code(session_id, state.chart_code)
 
-                # Execute chart code to generate HTML
+                # Execute chart code to generate HTML. The final response only
+                # needs to know whether a chart exists (it reads chart_code),
+                # so the kernel execution can overlap the final LLM call.
                 await self.websocket_manager.send_log(session_id, "🎨 Executing chart generation...")
+                chart_task = asyncio.create_task(self._execute_chart_code(state))
 
-                # Get kernel manager and execute chart code
-                from ..services.jupyter_service import get_jupyter_service
-                from ..services.session_service import get_session_manager
-                jupyter_service = get_jupyter_service()
-                session_manager = get_session_manager()
-                kernel_manager = session_manager.get_kernel_manager(session_id)
-                if kernel_manager:
-                    execution_result = await jupyter_service.execute_code(kernel_manager, state.chart_code)
-
-                    if execution_result.success:
-                        # Extract HTML from execution result
-                        chart_html = execution_result.stdout if execution_result.stdout else None
-
-                        if chart_html and len(chart_html.strip()) > 100:  # Basic validation
-                            # Store chart HTML to file
-                            from ..services.file_storage_service import get_file_storage_service
-                            file_storage = get_file_storage_service()
-                            file_info = file_storage.store_chart_html(session_id, chart_html, "chart")
-
-                            # Store chart HTML in intermediate results
-                            chart_result = {
-                                "step": "chart_generation",
-                                "type": "chart_html",
-                                "content": chart_html,
-                                "code": state.chart_code,
-                                "file_info": file_info,
-                                "variables": ["chart_html"]
-                            }
-                            state.intermediate_results.append(chart_result)
-
-                            # Send chart to frontend
-                            await self.websocket_manager.send_chart(session_id, {
-                                "type": "html",
-                                "content": chart_html,
-                                "file_url": file_info.get("url", ""),
-                                "filename": file_info.get("filename", "")
-                            })
-                            await self.websocket_manager.send_log(session_id, f"✅ Chart generated and saved as {file_info.get('filename', 'chart.html')}!")
-                        else:
-                            await self.websocket_manager.send_log(session_id, "⚠️ Chart code executed but no valid HTML output received")
-                    else:
-                        await self.websocket_manager.send_log(session_id, f"❌ Chart execution failed: {execution_result.stderr}")
-                else:
-                    await self.websocket_manager.send_log(session_id, "❌ No kernel manager available for chart execution")
-
-            # Step 4: Final response
+            # Step 4: Final response (overlaps chart execution when running)
             await self.websocket_manager.send_log(session_id, "📝 Generating final response...")
-            state = await multi_agent_service._final_response_agent(state)
+            if chart_task is not None:
+                _, state = await asyncio.gather(
+                    chart_task,
+                    multi_agent_service._final_response_agent(state)
+                )
+            else:
+                state = await multi_agent_service._final_response_agent(state)
 
             if state.final_response:
                 await self.websocket_manager.send_final_response(session_id, state.final_response)
 
                 # Save conversation turn to session history
-                from ..services.session_service import get_session_manager
-                session_manager = get_session_manager()
+                _, session_manager, _ = _get_deps()
                 session_manager.add_conversation_turn(session_id, state.user_query, state.final_response)
 
             await self.websocket_manager.send_log(session_id, "✅ Query processing completed!")
 
         except Exception as e:
-            print(f"❌ Streaming processing error: {e}")
+            logger.exception("❌ Streaming processing error")
             await self.websocket_manager.send_error(session_id, f"Processing error: {str(e)}")
 
+    async def _execute_chart_code(self, state) -> None:
+        """Execute generated chart code in the kernel and stream the result."""
+        session_id = state.session_id
+
+        # Get kernel manager and execute chart code
+        jupyter_service, session_manager, file_storage = _get_deps()
+        kernel_manager = session_manager.get_kernel_manager(session_id)
+        if kernel_manager:
+            execution_result = await jupyter_service.execute_code(kernel_manager, state.chart_code)
+
+            if execution_result.success:
+                # Extract HTML from execution result
+                chart_html = execution_result.stdout if execution_result.stdout else None
+
+                if chart_html and len(chart_html.strip()) > 100:  # Basic validation
+                    # Store chart HTML to file
+                    file_info = file_storage.store_chart_html(session_id, chart_html, "chart")
+
+                    # Store chart HTML in intermediate results
+                    chart_result = {
+                        "step": "chart_generation",
+                        "type": "chart_html",
+                        "content": chart_html,
+                        "code": state.chart_code,
+                        "file_info": file_info,
+                        "variables": ["chart_html"]
+                    }
+                    state.intermediate_results.append(chart_result)
+
+                    # The HTML is already on disk behind a static URL, so the
+                    # frame only carries the pointer — the browser iframes the
+                    # URL instead of receiving a second in-message copy
+                    file_url = file_info.get("url", "")
+                    if file_url:
+                        await self.websocket_manager.send_chart(session_id, {
+                            "type": "html_url",
+                            "file_url": file_url,
+                            "filename": file_info.get("filename", ""),
+                            "size_bytes": len(chart_html)
+                        })
+                    else:
+                        # No stored file to point at: fall back to chunked inline HTML
+                        await self.websocket_manager.send_chart_streaming(
+                            session_id, chart_html, metadata={"type": "html"}
+                        )
+                    await self.websocket_manager.send_log(session_id, f"✅ Chart generated and saved as {file_info.get('filename', 'chart.html')}!")
+                else:
+                    await self.websocket_manager.send_log(session_id, "⚠️ Chart code executed but no valid HTML output received")
+            else:
+                await self.websocket_manager.send_log(session_id, f"❌ Chart execution failed: {execution_result.stderr}")
+        else:
+            await self.websocket_manager.send_log(session_id, "❌ No kernel manager available for chart execution")
+
 
 # class StreamingMultiAgentService:
 #     """Multi-agent service with WebSocket streaming capabilities."""
@@ -1,21 +1,47 @@
 """Data processing utilities."""
 
+import numpy as np
+import orjson
 import pandas as pd
 from typing import Any, Dict, List
 
 
+def _float_or_none(value: float) -> Any:
+    return None if value != value else value  # NaN is the only value != itself
+
+
+# Exact-type dispatch: one dict probe for the overwhelmingly common types,
+# instead of a pd.isna call (numpy broadcast machinery) per cell
+_JSON_DISPATCH = {
+    str: lambda o: o,
+    int: lambda o: o,
+    bool: lambda o: o,
+    float: _float_or_none,
+    type(None): lambda o: None,
+    np.int32: int,
+    np.int64: int,
+    np.float32: lambda o: None if np.isnan(o) else float(o),
+    np.float64: lambda o: None if np.isnan(o) else float(o),
+    np.bool_: bool,
+    pd.Timestamp: lambda o: None if o is pd.NaT else o.isoformat(),
+}
+
+
 def convert_to_json_serializable(obj: Any) -> Any:
     """Convert pandas/numpy objects to JSON-serializable Python types."""
-    if obj is None or pd.isna(obj):
-        return None
-    elif hasattr(obj, 'item'):  # numpy scalar
-        return obj.item()
-    elif isinstance(obj, (list, tuple)):
+    handler = _JSON_DISPATCH.get(type(obj))
+    if handler is not None:
+        return handler(obj)
+    if isinstance(obj, (list, tuple)):
         return [convert_to_json_serializable(item) for item in obj]
-    elif isinstance(obj, dict):
+    if isinstance(obj, dict):
         return {key: convert_to_json_serializable(value) for key, value in obj.items()}
-    else:
-        return obj
+    # Rare scalar types only: NaT/NA sentinels, then generic numpy scalars
+    if pd.isna(obj):
+        return None
+    if hasattr(obj, 'item'):  # numpy scalar
+        return obj.item()
+    return obj
 
 
 def safe_describe_dataframe(df: pd.DataFrame) -> Dict[str, Any]:
@@ -25,14 +51,15 @@ def safe_describe_dataframe(df: pd.DataFrame) -> Dict[str, Any]:
     # Replace NaN/NaT with None for JSON compatibility
     desc = desc.where(pd.notnull(desc), None)
     
-    # Convert to Python native types more safely
-    description = {}
-    for col_name, col_data in desc.to_dict().items():
-        description[col_name] = {}
-        for stat_name, stat_value in col_data.items():
-            description[col_name][stat_name] = convert_to_json_serializable(stat_value)
-    
-    return description
+    # One orjson round-trip converts every numpy scalar in C instead of
+    # walking cols x stats through convert_to_json_serializable
+    return orjson.loads(
+        orjson.dumps(
+            desc.to_dict(),
+            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS,
+            default=str,
+        )
+    )
 
 
 def get_categorical_unique_values(df: pd.DataFrame, max_unique: int = None) -> Dict[str, List[Any]]:
@@ -42,14 +69,13 @@ def get_categorical_unique_values(df: pd.DataFrame, max_unique: int = None) -> D
         max_unique = get_settings().max_categorical_unique
 
     categorical_values: Dict[str, List[Any]] = {}
-    for column_name, dtype in df.dtypes.items():
-        if str(dtype) in {"object", "category"}:
-            unique_vals = pd.unique(df[column_name].dropna())
-            if len(unique_vals) <= max_unique:
-                # Convert to native Python types for JSON serialization
-                categorical_values[column_name] = [
-                    convert_to_json_serializable(val) for val in unique_vals
-                ]
+    for column_name in df.select_dtypes(include=["object", "category"]).columns:
+        # Work on the raw array: one pass, no intermediate dropna Series
+        arr = df[column_name].to_numpy(copy=False)
+        unique_vals = pd.unique(arr[pd.notna(arr)])
+        if unique_vals.size <= max_unique:
+            # tolist() already yields native Python objects for these dtypes
+            categorical_values[column_name] = unique_vals.tolist()
     return categorical_values
 
 
@@ -59,28 +85,34 @@ def get_data_sample(df: pd.DataFrame, sample_size: int = None) -> List[Dict[str,
         from ..config.settings import get_settings
         sample_size = get_settings().data_sample_size
 
-    sample_df = df.head(sample_size).where(pd.notnull(df.head(sample_size)), None)
-    return [
-        {key: convert_to_json_serializable(value) for key, value in row.items()}
-        for row in sample_df.to_dict(orient="records")
-    ]
+    # orjson natively handles numpy scalars, Timestamps and NaN at C speed;
+    # a dumps/loads round-trip replaces the per-cell Python recursion
+    head = df.head(sample_size)
+    sample_df = head.where(pd.notnull(head), None)
+    return orjson.loads(
+        orjson.dumps(
+            sample_df.to_dict(orient="records"),
+            option=orjson.OPT_SERIALIZE_NUMPY,
+            default=str,
+        )
+    )
 
 
 def get_missing_values_report(df: pd.DataFrame) -> List[Dict[str, Any]]:
     """Generate missing values report for all columns."""
-    report: List[Dict[str, Any]] = []
     total_rows = len(df)
-    for column_name in df.columns:
-        missing_count = int(df[column_name].isna().sum())
-        missing_percentage = (missing_count / total_rows * 100.0) if total_rows else 0.0
-        report.append(
-            {
-                "column_name": column_name,
-                "missing_count": missing_count,
-                "missing_percentage": round(missing_percentage, 4),
-            }
-        )
-    return report
+    # One vectorized pass over the frame instead of a boolean Series per column
+    counts = df.isna().sum()
+    return [
+        {
+            "column_name": column_name,
+            "missing_count": int(missing_count),
+            "missing_percentage": round(
+                (missing_count / total_rows * 100.0) if total_rows else 0.0, 4
+            ),
+        }
+        for column_name, missing_count in counts.items()
+    ]
 
 def filter_required_columns(metadata_dict, filtered_columns):
     """
@@ -1,11 +1,30 @@
 """File handling utilities."""
 
+import asyncio
 import json
+import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import orjson
+
+logger = logging.getLogger(__name__)
 from typing import Any, Dict, List
 import time
 
 
+def _dir_mtime(*directories: str) -> int:
+    """Latest mtime across directories; changes whenever files are added."""
+    latest = 0
+    for directory in directories:
+        try:
+            latest = max(latest, int(os.path.getmtime(directory)))
+        except OSError:
+            pass
+    return latest
+
+
 def ensure_directory_exists(directory_path: str) -> None:
     """Ensure that a directory exists, creating it if necessary."""
     os.makedirs(directory_path, exist_ok=True)
@@ -14,14 +33,14 @@ def ensure_directory_exists(directory_path: str) -> None:
 def save_json_file(data: Dict[str, Any], file_path: str) -> None:
     """Save data to a JSON file with proper formatting."""
     ensure_directory_exists(os.path.dirname(file_path))
-    with open(file_path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    with open(file_path, "wb") as f:
+        f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
 
 
 def load_json_file(file_path: str) -> Dict[str, Any]:
     """Load data from a JSON file."""
-    with open(file_path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    with open(file_path, "rb") as f:
+        return orjson.loads(f.read())
 
 
 def file_exists(file_path: str) -> bool:
@@ -36,6 +55,12 @@ def get_filename_without_extension(file_path: str) -> str:
 
 def get_metadata_file_path(dataset_name: str, metadata_dir: str = "metadata") -> str:
     """Generate metadata file path for a dataset, handling timestamped files."""
+    return _resolve_metadata_path(dataset_name, metadata_dir, _dir_mtime(metadata_dir))
+
+
+@lru_cache(maxsize=512)
+def _resolve_metadata_path(dataset_name: str, metadata_dir: str, mtime: int) -> str:
+    """Glob-resolve a metadata path; memoized until the directory changes."""
     import glob
     
     # First try the exact filename
@@ -52,7 +77,7 @@ def get_metadata_file_path(dataset_name: str, metadata_dir: str = "metadata") ->
     if matches:
         # Return the most recent one (sorted by filename which includes timestamp)
         most_recent = sorted(matches)[-1]
-        print(f"🔍 Mapped {dataset_name} to timestamped file: {os.path.basename(most_recent)}")
+        logger.info("🔍 Mapped %s to timestamped file: %s", dataset_name, os.path.basename(most_recent))
         return most_recent
     
     # If no matches found, return the original path (will cause 404)
@@ -61,6 +86,16 @@ def get_metadata_file_path(dataset_name: str, metadata_dir: str = "metadata") ->
 
 def find_dataset_file(dataset_name: str, datasets_dir: str = "datasets", uploads_dir: str = "uploads") -> str:
     """Find the actual dataset file, handling timestamped versions."""
+    # Memoized on the directory mtimes, so new uploads invalidate naturally
+    # while repeat lookups skip the glob scans
+    return _resolve_dataset_file(
+        dataset_name, datasets_dir, uploads_dir, _dir_mtime(datasets_dir, uploads_dir)
+    )
+
+
+@lru_cache(maxsize=512)
+def _resolve_dataset_file(dataset_name: str, datasets_dir: str, uploads_dir: str, mtime: int) -> str:
+    """Glob-resolve a dataset path; memoized until either directory changes."""
     import glob
     
     # Check datasets directory first
@@ -80,7 +115,7 @@ def find_dataset_file(dataset_name: str, datasets_dir: str = "datasets", uploads
     
     if uploads_matches:
         most_recent = sorted(uploads_matches)[-1]
-        print(f"🔍 Mapped {dataset_name} to timestamped dataset: {os.path.basename(most_recent)}")
+        logger.info("🔍 Mapped %s to timestamped dataset: %s", dataset_name, os.path.basename(most_recent))
         return most_recent
     
     # Try timestamped versions in datasets directory  
@@ -89,12 +124,13 @@ def find_dataset_file(dataset_name: str, datasets_dir: str = "datasets", uploads
     
     if datasets_matches:
         most_recent = sorted(datasets_matches)[-1]
-        print(f"🔍 Mapped {dataset_name} to timestamped dataset: {os.path.basename(most_recent)}")
+        logger.info("🔍 Mapped %s to timestamped dataset: %s", dataset_name, os.path.basename(most_recent))
         return most_recent
     
     # If nothing found, raise an error
     raise FileNotFoundError(f"Dataset not found: {dataset_name} (checked {datasets_dir} and {uploads_dir})")
 
+@lru_cache(maxsize=256)
 def get_relationships_file_path(dataset_name: str, metadata_dir: str = "metadata") -> str:
     """Generate relationships file path for a dataset."""
     return os.path.join(metadata_dir, f"{dataset_name}_relationships.json")
@@ -126,54 +162,105 @@ def convert_csv_to_parquet(
         Exception: For any other errors during conversion
     """
     try:
-        import pandas as pd
         # Find dataset file using smart lookup
         final_dataset_path = find_dataset_file(dataset_name, datasets_dir, uploads_subdir)
-        print(f"📁 Found dataset: {final_dataset_path}")
-        # Load CSV with timing
-        print(f"📊 Loading dataset from: {final_dataset_path}")
-        start_time = time.time()
-        df = pd.read_csv(final_dataset_path)
-        load_time = time.time() - start_time
-        print(f"✅ CSV loaded in {load_time:.2f}s ({len(df)} rows, {len(df.columns)} columns)")
-        
-        # Filter columns if specified
-        if filtered_columns:
-            # Check if all filtered columns exist in the dataset
-            missing_columns = set(filtered_columns) - set(df.columns)
-            if missing_columns:
-                raise ValueError(f"The following columns are not found in the dataset: {missing_columns}")
-            
-            # Select only the filtered columns
-            df_filtered = df[filtered_columns]
-            print(f"🔍 Filtered to {len(filtered_columns)} columns: {filtered_columns}")
-        else:
-            df_filtered = df
-            print("ℹ️  No column filtering applied - using all columns")
-        
+        logger.debug("📁 Found dataset: %s", final_dataset_path)
 
         # Use dataset name without extension
         base_name = os.path.splitext(os.path.basename(dataset_name))[0]
         output_filename = f"{base_name}_filtered.parquet"
-        
+
         # Ensure output directory exists
         os.makedirs(temp_dir, exist_ok=True)
-        
-        # Save as parquet
         parquet_path = os.path.join(temp_dir, output_filename)
-        start_save_time = time.time()
-        df_filtered.to_parquet(parquet_path, index=False)
-        save_time = time.time() - start_save_time
-        
-        print(f"💾 Dataset saved as parquet: {parquet_path}")
-        print(f"⚡ Parquet saved in {save_time:.2f}s ({len(df_filtered)} rows, {len(df_filtered.columns)} columns)")
-        
+
+        logger.info("📊 Loading dataset from: %s", final_dataset_path)
+        start_time = time.time()
+        try:
+            # Arrow's multithreaded C++ reader parses only the requested
+            # columns — no full-width DataFrame, no object-dtype overhead.
+            # Streaming batch-by-batch into a ParquetWriter bounds memory at
+            # one CSV block instead of the whole filtered dataset.
+            from pyarrow import csv as pacsv
+            import pyarrow.parquet as pq
+
+            convert_options = (
+                pacsv.ConvertOptions(include_columns=filtered_columns)
+                if filtered_columns
+                else None
+            )
+            read_options = pacsv.ReadOptions(block_size=64 << 20)
+            saved_rows = 0
+            with pacsv.open_csv(
+                final_dataset_path,
+                read_options=read_options,
+                convert_options=convert_options,
+            ) as reader:
+                saved_columns = reader.schema.names
+                with pq.ParquetWriter(parquet_path, reader.schema, compression="zstd") as writer:
+                    for batch in reader:
+                        writer.write_batch(batch)
+                        saved_rows += batch.num_rows
+            save_time = time.time() - start_time
+            logger.info("✅ CSV streamed to parquet in %.2fs (%s rows, %s columns)", save_time, saved_rows, len(saved_columns))
+        except KeyError as e:
+            # include_columns referenced a column the CSV does not have
+            raise ValueError(f"The following columns are not found in the dataset: {e}")
+        except ValueError:
+            raise
+        except Exception as arrow_error:
+            # Arrow type inference can fail on messy CSVs; fall back to pandas
+            logger.warning("⚠️ Arrow CSV read failed (%s), falling back to pandas", arrow_error)
+            import pandas as pd
+
+            df = pd.read_csv(final_dataset_path)
+            if filtered_columns:
+                missing_columns = set(filtered_columns) - set(df.columns)
+                if missing_columns:
+                    raise ValueError(f"The following columns are not found in the dataset: {missing_columns}")
+                df = df[filtered_columns]
+            start_save_time = time.time()
+            df.to_parquet(parquet_path, index=False)
+            save_time = time.time() - start_save_time
+            saved_columns = list(df.columns)
+            saved_rows = len(df)
+
+        # Persist the projection next to the parquet so session init can
+        # push the column selection down into the read
+        columns_path = os.path.join(temp_dir, f"{base_name}_columns.json")
+        with open(columns_path, "w", encoding="utf-8") as f:
+            json.dump(saved_columns, f)
+
+        logger.info("💾 Dataset saved as parquet: %s", parquet_path)
+        logger.debug("⚡ Parquet saved in %.2fs (%s rows, %s columns)", save_time, saved_rows, len(saved_columns))
+
     except FileNotFoundError as e:
-        print(f"❌ Dataset file not found: {e}")
+        logger.error("❌ Dataset file not found: %s", e)
         raise
     except ValueError as e:
-        print(f"❌ Column filtering error: {e}")
+        logger.error("❌ Column filtering error: %s", e)
         raise
     except Exception as e:
-        print(f"❌ Failed to convert CSV to parquet: {e}")
+        logger.error("❌ Failed to convert CSV to parquet: %s", e)
         raise
+
+
+# Bounded pool for CSV conversion so a burst of uploads cannot saturate the
+# default executor that asyncio.to_thread and run_in_executor share
+_CSV_POOL = ThreadPoolExecutor(max_workers=min(4, os.cpu_count() or 1), thread_name_prefix="csv2pq")
+
+
+async def convert_csv_to_parquet_async(
+    dataset_name: str,
+    filtered_columns: List[str],
+    datasets_dir: str = "datasets",
+    temp_dir: str = "temp_data",
+    uploads_subdir: str = "uploads",
+) -> str:
+    """Run convert_csv_to_parquet on the conversion pool without blocking the event loop."""
+    return await asyncio.get_running_loop().run_in_executor(
+        _CSV_POOL,
+        lambda: convert_csv_to_parquet(
+            dataset_name, filtered_columns, datasets_dir, temp_dir, uploads_subdir
+        ),
+    )
@@ -1,8 +1,10 @@
 """Comprehensive logging utilities for Phase 2."""
 
 import logging
+import logging.handlers
+import queue
 import sys
-from datetime import datetime
+import time
 from typing import Any, Dict, Optional
 
 
@@ -19,12 +21,22 @@ class ColoredFormatter(logging.Formatter):
         'RESET': '\033[0m'      # Reset
     }
     
+    # Colored level strings built once, not per record
+    _COLORED_LEVELS = {
+        level: f"{color}{level}\033[0m"
+        for level, color in COLORS.items()
+        if level != 'RESET'
+    }
+    
     def format(self, record):
-        # Add color to the log level
-        if record.levelname in self.COLORS:
-            record.levelname = f"{self.COLORS[record.levelname]}{record.levelname}{self.COLORS['RESET']}"
-        
-        return super().format(record)
+        # Swap in the precomputed colored level, restoring the original so
+        # other handlers on the same record never see ANSI codes
+        original = record.levelname
+        record.levelname = self._COLORED_LEVELS.get(original, original)
+        try:
+            return super().format(record)
+        finally:
+            record.levelname = original
 
 
 def setup_logging(log_level: str = "INFO") -> logging.Logger:
@@ -62,19 +74,23 @@ class AgentLogger:
         self.session_id = session_id
         self.agent_name = agent_name
         self.logger = logging.getLogger(f"agent.{agent_name}")
+        self._op_starts: Dict[str, int] = {}
         
     def log_start(self, operation: str, **kwargs) -> None:
-        """Log the start of an operation."""
-        extra_info = " | ".join([f"{k}={v}" for k, v in kwargs.items()])
-        message = f"🚀 [{self.session_id}] {self.agent_name} starting: {operation}"
-        if extra_info:
-            message += f" | {extra_info}"
-        self.logger.info(message)
+        """Record the start of an operation; the event is emitted on completion."""
+        self._op_starts[operation] = time.perf_counter_ns()
+        if kwargs and self.logger.isEnabledFor(logging.DEBUG):
+            extra_info = " | ".join([f"{k}={v}" for k, v in kwargs.items()])
+            self.logger.debug("🚀 [%s] %s starting: %s | %s", self.session_id, self.agent_name, operation, extra_info)
+    
+    def _duration_ms(self, operation: str) -> float:
+        started = self._op_starts.pop(operation, None)
+        return 0.0 if started is None else (time.perf_counter_ns() - started) / 1e6
     
     def log_success(self, operation: str, result: Any = None, **kwargs) -> None:
-        """Log successful completion of an operation."""
+        """Emit one structured event for a completed operation."""
         extra_info = " | ".join([f"{k}={v}" for k, v in kwargs.items()])
-        message = f"✅ [{self.session_id}] {self.agent_name} completed: {operation}"
+        message = f"✅ [{self.session_id}] {self.agent_name} completed: {operation} | dur_ms={self._duration_ms(operation):.1f}"
         if result:
             message += f" | result: {str(result)[:100]}..."
         if extra_info:
@@ -82,9 +98,9 @@ class AgentLogger:
         self.logger.info(message)
     
     def log_error(self, operation: str, error: Exception, **kwargs) -> None:
-        """Log an error during an operation."""
+        """Emit one structured event for a failed operation."""
         extra_info = " | ".join([f"{k}={v}" for k, v in kwargs.items()])
-        message = f"❌ [{self.session_id}] {self.agent_name} error in: {operation} | error: {str(error)}"
+        message = f"❌ [{self.session_id}] {self.agent_name} error in: {operation} | dur_ms={self._duration_ms(operation):.1f} | error: {str(error)}"
         if extra_info:
             message += f" | {extra_info}"
         self.logger.error(message)
@@ -190,12 +206,13 @@ class PerformanceLogger:
     def __init__(self):
         """Initialize performance logger."""
         self.logger = logging.getLogger("performance")
-        self.start_times: Dict[str, datetime] = {}
+        self.start_times: Dict[str, int] = {}
     
     def start_timer(self, operation: str, session_id: str = None) -> None:
         """Start timing an operation."""
         key = f"{session_id}:{operation}" if session_id else operation
-        self.start_times[key] = datetime.now()
+        # perf_counter_ns: plain int, monotonic, no datetime allocation
+        self.start_times[key] = time.perf_counter_ns()
         
         message = f"⏱️ Started timing: {operation}"
         if session_id:
@@ -211,7 +228,7 @@ class PerformanceLogger:
             return 0.0
         
         start_time = self.start_times.pop(key)
-        duration = (datetime.now() - start_time).total_seconds()
+        duration = (time.perf_counter_ns() - start_time) / 1e9
         
         message = f"⏱️ Completed timing: {operation} | duration: {duration:.2f}s"
         if session_id:
@@ -226,6 +243,23 @@ class PerformanceLogger:
         self.logger.info(message)
 
 
+# Agent records go through a queue to a background listener so formatting
+# and the synchronous stdout write never run on the event loop thread
+_agent_logger = logging.getLogger("agent")
+if not _agent_logger.handlers:
+    _agent_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    _agent_stream = logging.StreamHandler(sys.stdout)
+    _agent_stream.setFormatter(ColoredFormatter(
+        fmt='%(asctime)s | %(levelname)s | %(name)s | %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    ))
+    _agent_logger.addHandler(logging.handlers.QueueHandler(_agent_queue))
+    _agent_logger.setLevel(logging.INFO)
+    _agent_logger.propagate = False
+    _agent_listener = logging.handlers.QueueListener(_agent_queue, _agent_stream)
+    _agent_listener.start()
+
+
 # Global logger instances
 main_logger = setup_logging()
 performance_logger = PerformanceLogger()
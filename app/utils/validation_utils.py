@@ -1,21 +1,22 @@
 """Validation utilities for data and requests."""
 
-import json
 from typing import Any, Dict
 
+import orjson
+
 
 def validate_json_content(content: str) -> Dict[str, Any]:
     """Validate and parse JSON content with fallback extraction."""
     try:
-        return json.loads(content)
-    except json.JSONDecodeError:
+        return orjson.loads(content)
+    except orjson.JSONDecodeError:
         # Attempt basic brace-extraction fallback
         try:
             start = content.find("{")
             end = content.rfind("}")
             if start != -1 and end != -1 and end > start:
-                return json.loads(content[start : end + 1])
-        except json.JSONDecodeError as exc:
+                return orjson.loads(content[start : end + 1])
+        except orjson.JSONDecodeError as exc:
             raise RuntimeError(f"Model did not return valid JSON: {exc}") from exc
     
     # If parsing still fails, raise a generic error
@@ -24,4 +25,6 @@ def validate_json_content(content: str) -> Dict[str, Any]:
 
 def format_input_payload(agent_input: Dict[str, Any]) -> str:
     """Format agent input as a compact JSON string for prompts."""
-    return json.dumps(agent_input, ensure_ascii=False, indent=2)
+    return orjson.dumps(
+        agent_input, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+    ).decode()
@@ -1,19 +1,120 @@
 """Demo script for Phase 2 Natural Language Querying."""
 
 import asyncio
-import json
 import os
-import time
-from typing import Dict, Any
+import sys
+from typing import Any, Dict, NamedTuple
 
-import websockets
-from fastapi.testclient import TestClient
+import orjson
+
+try:
+    import msgpack
+except ImportError:  # Binary framing demo is optional, like the server side
+    msgpack = None
+
+try:
+    import uvloop
+except ImportError:  # Stock asyncio works fine; uvloop is just faster
+    uvloop = None
+
+try:
+    from rich import print_json as _rich_print_json
+except ImportError:  # Plain output is fine; rich just adds highlighting
+    _rich_print_json = None
+
+
+# Banner separators allocated once instead of per demo run
+_BAR50 = "=" * 50
+_BAR60 = "=" * 60
+
+
+def _emit(lines) -> None:
+    """Write a block of lines with one writev syscall instead of one per line."""
+    data = ("\n".join(lines) + "\n").encode()
+    try:
+        sys.stdout.flush()  # Keep ordering with anything already buffered
+        os.writev(sys.stdout.fileno(), [data])
+    except (OSError, ValueError, AttributeError):  # Captured/non-fd stdout
+        sys.stdout.write(data.decode())
+
+
+def _dumps(obj: Any, indent: int = 2) -> str:
+    """Pretty-print through orjson's C encoder (orjson only indents by 2)."""
+    text = orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode()
+    if indent != 2:
+        pad = " " * (indent - 2)
+        text = text.replace("\n", "\n" + pad)
+    return text
+
+
+def _print_json(encoded: str, prefix: str = "") -> None:
+    """Print an encoded JSON frame, syntax-highlighted when rich is installed."""
+    if _rich_print_json is not None:
+        if prefix:
+            print(prefix)
+        _rich_print_json(encoded)
+    else:
+        print(f"{prefix} {encoded}" if prefix else encoded)
+
+
+# Example streaming responses, encoded once at import — one encode, N prints,
+# mirroring the pre-framed broadcast pattern on the server side
+_EXAMPLE_RESPONSES = [
+    {
+        "type": "log",
+        "payload": "🎯 Starting planning phase...",
+        "timestamp": "2025-08-10T14:30:00"
+    },
+    {
+        "type": "plan",
+        "payload": [
+            "Filter the DataFrame to include only driver performance data",
+            "Calculate performance metrics for each driver",
+            "Sort drivers by performance score in descending order",
+            "Select the top 5 drivers",
+            "Display the results with driver names and scores"
+        ],
+        "timestamp": "2025-08-10T14:30:05"
+    },
+    {
+        "type": "thought",
+        "payload": "I need to analyze driver performance. Let me start by examining the available columns and calculating a performance score.",
+        "timestamp": "2025-08-10T14:30:10",
+        "step_index": 0
+    },
+    {
+        "type": "code",
+        "payload": "print('Analyzing driver performance data...')\nprint('Available columns:', list(df.columns))\nprint('Dataset shape:', df.shape)",
+        "timestamp": "2025-08-10T14:30:15",
+        "step_index": 0
+    },
+    {
+        "type": "execution_success",
+        "payload": "Analyzing driver performance data...\nAvailable columns: ['DriverID', 'OnTimeDelivery', 'Distance_km', 'FuelConsumption_litre']\nDataset shape: (1000, 4)",
+        "timestamp": "2025-08-10T14:30:20",
+        "step_index": 0
+    },
+    {
+        "type": "chart",
+        "payload": {
+            "type": "plotly_json",
+            "data": {"data": [{"x": ["Driver1", "Driver2"], "y": [95, 87], "type": "bar"}]}
+        },
+        "timestamp": "2025-08-10T14:30:45"
+    },
+    {
+        "type": "final_response",
+        "payload": "Based on the analysis, here are the top 5 drivers by performance: Driver1 (95% score), Driver2 (87% score), Driver3 (82% score), Driver4 (78% score), and Driver5 (75% score). The performance score is calculated based on on-time delivery rate and fuel efficiency. I have also generated a chart to visualize this information.",
+        "timestamp": "2025-08-10T14:30:50"
+    }
+]
+_EXAMPLE_RESPONSES_ENCODED = tuple(_dumps(r) for r in _EXAMPLE_RESPONSES)
 
 
 async def demo_websocket_interaction():
     """Demonstrate WebSocket interaction with the multi-agent system."""
     print("🎭 Phase 2 WebSocket Demo")
-    print("=" * 50)
+    print(_BAR50)
     
     # Note: This demo shows the structure but requires a running server
     # and OpenAI API key to actually work
@@ -32,7 +133,7 @@ async def demo_websocket_interaction():
         "query": "What is the average delivery time by city?",
         "conversation_history": []
     }
-    print(json.dumps(example_request, indent=2))
+    _print_json(_dumps(example_request))
     
     print("\n📡 Example WebSocket Messages:")
     
@@ -42,63 +143,22 @@ async def demo_websocket_interaction():
         "query": "Show me the top 5 drivers by performance",
         "conversation_history": []
     }
-    print(f"📤 Send: {json.dumps(query_message, indent=2)}")
-    
-    # Example streaming responses
-    example_responses = [
-        {
-            "type": "log",
-            "payload": "🎯 Starting planning phase...",
-            "timestamp": "2025-08-10T14:30:00"
-        },
-        {
-            "type": "plan",
-            "payload": [
-                "Filter the DataFrame to include only driver performance data",
-                "Calculate performance metrics for each driver",
-                "Sort drivers by performance score in descending order",
-                "Select the top 5 drivers",
-                "Display the results with driver names and scores"
-            ],
-            "timestamp": "2025-08-10T14:30:05"
-        },
-        {
-            "type": "thought",
-            "payload": "I need to analyze driver performance. Let me start by examining the available columns and calculating a performance score.",
-            "timestamp": "2025-08-10T14:30:10",
-            "step_index": 0
-        },
-        {
-            "type": "code",
-            "payload": "print('Analyzing driver performance data...')\nprint('Available columns:', list(df.columns))\nprint('Dataset shape:', df.shape)",
-            "timestamp": "2025-08-10T14:30:15",
-            "step_index": 0
-        },
-        {
-            "type": "execution_success",
-            "payload": "Analyzing driver performance data...\nAvailable columns: ['DriverID', 'OnTimeDelivery', 'Distance_km', 'FuelConsumption_litre']\nDataset shape: (1000, 4)",
-            "timestamp": "2025-08-10T14:30:20",
-            "step_index": 0
-        },
-        {
-            "type": "chart",
-            "payload": {
-                "type": "plotly_json",
-                "data": {"data": [{"x": ["Driver1", "Driver2"], "y": [95, 87], "type": "bar"}]}
-            },
-            "timestamp": "2025-08-10T14:30:45"
-        },
-        {
-            "type": "final_response",
-            "payload": "Based on the analysis, here are the top 5 drivers by performance: Driver1 (95% score), Driver2 (87% score), Driver3 (82% score), Driver4 (78% score), and Driver5 (75% score). The performance score is calculated based on on-time delivery rate and fuel efficiency. I have also generated a chart to visualize this information.",
-            "timestamp": "2025-08-10T14:30:50"
-        }
-    ]
-    
-    for i, response in enumerate(example_responses, 1):
-        print(f"\n📥 Receive {i}: {json.dumps(response, indent=2)}")
-        time.sleep(0.5)  # Simulate real-time streaming
+    _print_json(_dumps(query_message), prefix="📤 Send:")
+
+
+    for i, encoded in enumerate(_EXAMPLE_RESPONSES_ENCODED, 1):
+        _print_json(encoded, prefix=f"\n📥 Receive {i}:")
+        await asyncio.sleep(0.5)  # Simulate real-time streaming without blocking the loop
     
+    if msgpack is not None:
+        # The live stream negotiates this via ws://...?format=msgpack
+        print("\n📦 Binary framing (MessagePack) vs JSON for frame 1:")
+        packed = msgpack.packb(_EXAMPLE_RESPONSES[0], use_bin_type=True)
+        json_size = len(orjson.dumps(_EXAMPLE_RESPONSES[0]))
+        print(f"   JSON: {json_size} bytes → MessagePack: {len(packed)} bytes")
+        decoded = msgpack.unpackb(packed, raw=False)
+        print(f"   Round-trip type field: {decoded['type']}")
+
     print("\n✅ Demo completed!")
     print("\n🚀 To run this for real:")
     print("1. Set your OPENAI_API_KEY in .env file")
@@ -109,7 +169,7 @@ async def demo_websocket_interaction():
 def demo_api_structure():
     """Demonstrate the API structure without requiring a server."""
     print("\n🏗️ Phase 2 API Structure Demo")
-    print("=" * 50)
+    print(_BAR50)
     
     print("📋 Available Endpoints:")
     
@@ -167,105 +227,128 @@ def demo_api_structure():
         }
     ]
     
+    # One buffered write instead of a stdout lock + flush per line
+    out = []
     for endpoint in endpoints:
-        print(f"\n🔗 {endpoint['method']} {endpoint['path']}")
-        print(f"   📝 {endpoint['description']}")
+        out.append(f"\n🔗 {endpoint['method']} {endpoint['path']}")
+        out.append(f"   📝 {endpoint['description']}")
         
         if 'example_request' in endpoint:
-            print(f"   📤 Request: {json.dumps(endpoint['example_request'], indent=6)}")
+            out.append(f"   📤 Request: {_dumps(endpoint['example_request'], indent=6)}")
         
         if 'example_response' in endpoint:
-            print(f"   📥 Response: {json.dumps(endpoint['example_response'], indent=6)}")
+            out.append(f"   📥 Response: {_dumps(endpoint['example_response'], indent=6)}")
         
         if 'message_types' in endpoint:
-            print(f"   📡 Message Types: {', '.join(endpoint['message_types'])}")
+            out.append(f"   📡 Message Types: {', '.join(endpoint['message_types'])}")
+    _emit(out)
+
+
+class _WorkflowStep(NamedTuple):
+    """Fixed-field step record — tuple layout, no per-dict hash table."""
+    agent: str
+    emoji: str
+    task: str
+    input: str
+    output: str
+
+
+_WORKFLOW_STEPS = (
+    _WorkflowStep(
+        agent="Planner Agent",
+        emoji="🎯",
+        task="Analyze user query and create step-by-step plan",
+        input="User query + dataset metadata + conversation history",
+        output="Sequential list of actionable steps",
+    ),
+    _WorkflowStep(
+        agent="Code Generation Agent",
+        emoji="💻",
+        task="Generate Python code for current step using ReAct methodology",
+        input="Current step + full plan + execution history",
+        output="Thought process + Python code",
+    ),
+    _WorkflowStep(
+        agent="Code Executor",
+        emoji="🚀",
+        task="Execute code in Jupyter kernel safely",
+        input="Generated Python code",
+        output="Execution results (stdout, stderr, display data)",
+    ),
+    _WorkflowStep(
+        agent="Error Analysis Agent",
+        emoji="🔍",
+        task="Diagnose errors and suggest fixes (if needed)",
+        input="Failed code + error message + metadata",
+        output="Error diagnosis + fix suggestion",
+    ),
+    _WorkflowStep(
+        agent="Chart Generation Agent",
+        emoji="📊",
+        task="Create Plotly visualizations for final results",
+        input="User query + final data",
+        output="Plotly chart code",
+    ),
+    _WorkflowStep(
+        agent="Final Response Agent",
+        emoji="📝",
+        task="Synthesize findings into human-readable summary",
+        input="User query + final data + chart availability",
+        output="Comprehensive response",
+    ),
+)
+
+# Step records never change, so the f-string interpolation happens once at
+# import; each run just concatenates pre-rendered blocks
+_WORKFLOW_RENDERED = tuple(
+    f"\n{step.emoji} Step {i}: {step.agent}\n"
+    f"   🎯 Task: {step.task}\n"
+    f"   📥 Input: {step.input}\n"
+    f"   📤 Output: {step.output}"
+    for i, step in enumerate(_WORKFLOW_STEPS, 1)
+)
 
 
 def demo_agent_workflow():
     """Demonstrate the multi-agent workflow."""
     print("\n🤖 Multi-Agent Workflow Demo")
-    print("=" * 50)
-    
-    workflow_steps = [
-        {
-            "agent": "Planner Agent",
-            "emoji": "🎯",
-            "task": "Analyze user query and create step-by-step plan",
-            "input": "User query + dataset metadata + conversation history",
-            "output": "Sequential list of actionable steps"
-        },
-        {
-            "agent": "Code Generation Agent",
-            "emoji": "💻",
-            "task": "Generate Python code for current step using ReAct methodology",
-            "input": "Current step + full plan + execution history",
-            "output": "Thought process + Python code"
-        },
-        {
-            "agent": "Code Executor",
-            "emoji": "🚀",
-            "task": "Execute code in Jupyter kernel safely",
-            "input": "Generated Python code",
-            "output": "Execution results (stdout, stderr, display data)"
-        },
-        {
-            "agent": "Error Analysis Agent",
-            "emoji": "🔍",
-            "task": "Diagnose errors and suggest fixes (if needed)",
-            "input": "Failed code + error message + metadata",
-            "output": "Error diagnosis + fix suggestion"
-        },
-        {
-            "agent": "Chart Generation Agent",
-            "emoji": "📊",
-            "task": "Create Plotly visualizations for final results",
-            "input": "User query + final data",
-            "output": "Plotly chart code"
-        },
-        {
-            "agent": "Final Response Agent",
-            "emoji": "📝",
-            "task": "Synthesize findings into human-readable summary",
-            "input": "User query + final data + chart availability",
-            "output": "Comprehensive response"
-        }
-    ]
-    
-    for i, step in enumerate(workflow_steps, 1):
-        print(f"\n{step['emoji']} Step {i}: {step['agent']}")
-        print(f"   🎯 Task: {step['task']}")
-        print(f"   📥 Input: {step['input']}")
-        print(f"   📤 Output: {step['output']}")
-    
-    print(f"\n🔄 The workflow uses LangGraph for orchestration and includes:")
-    print("   • Conditional routing based on execution results")
-    print("   • Error recovery with automatic retry logic")
-    print("   • Real-time streaming of all agent activities")
-    print("   • State persistence across the entire workflow")
+    print(_BAR50)
+
+    out = list(_WORKFLOW_RENDERED)
+    out.append("\n🔄 The workflow uses LangGraph for orchestration and includes:")
+    out.append("   • Conditional routing based on execution results")
+    out.append("   • Error recovery with automatic retry logic")
+    out.append("   • Real-time streaming of all agent activities")
+    out.append("   • State persistence across the entire workflow")
+    _emit(out)
 
 
 def main():
     """Run all demos."""
     print("🎭 AI-Powered Logistics Assistant - Phase 2 Demo")
-    print("=" * 60)
+    print(_BAR60)
     
     demo_api_structure()
     demo_agent_workflow()
     
-    print("\n" + "=" * 60)
-    print("🎉 Phase 2 Implementation Complete!")
-    print("\n✨ Key Features Implemented:")
-    print("   • 🤖 Multi-agent system with 5 specialized agents")
-    print("   • 📡 Real-time WebSocket streaming")
-    print("   • 🛡️ Safe Jupyter sandbox execution")
-    print("   • 📊 Automatic chart generation")
-    print("   • 🔄 Error recovery and retry logic")
-    print("   • 📝 Comprehensive logging and monitoring")
-    print("   • 🎯 Session management with state persistence")
-    
-    print("\n🚀 Ready to process natural language queries!")
+    _emit([
+        "\n" + _BAR60,
+        "🎉 Phase 2 Implementation Complete!",
+        "\n✨ Key Features Implemented:",
+        "   • 🤖 Multi-agent system with 5 specialized agents",
+        "   • 📡 Real-time WebSocket streaming",
+        "   • 🛡️ Safe Jupyter sandbox execution",
+        "   • 📊 Automatic chart generation",
+        "   • 🔄 Error recovery and retry logic",
+        "   • 📝 Comprehensive logging and monitoring",
+        "   • 🎯 Session management with state persistence",
+        "\n🚀 Ready to process natural language queries!",
+    ])
     
-    # Run the async demo
+    # Run the async demo on uvloop when available — same libuv-based loop
+    # the server should be launched with (uvicorn --loop uvloop)
+    if uvloop is not None:
+        uvloop.install()
     asyncio.run(demo_websocket_interaction())
 
 